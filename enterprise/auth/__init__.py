@@ -4,33 +4,40 @@ Enterprise Authentication Module
 Multi-tenant authentication and authorization.
 """
 
-from typing import Optional
-from dataclasses import dataclass
+from typing import Mapping, Optional
+from dataclasses import dataclass, field
 from datetime import datetime, timedelta
+from types import MappingProxyType
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class Tenant:
-    """Tenant entity"""
+    """Tenant entity (immutable; settings is a read-only copy, left out of the hash)"""
     id: str
     name: str
     created_at: datetime
-    settings: dict
+    settings: Mapping = field(hash=False)
+    
+    def __post_init__(self):
+        object.__setattr__(self, "settings", MappingProxyType(dict(self.settings)))
     
     def is_active(self) -> bool:
         return self.settings.get("active", True)
 
 
-@dataclass 
+@dataclass(slots=True)
 class User:
     """User entity"""
     id: str
     tenant_id: str
     name: str
     email: str
-    permissions: list[str]
+    permissions: frozenset[str]
     created_at: datetime
     
+    def __post_init__(self):
+        self.permissions = frozenset(self.permissions)
+    
     def has_permission(self, permission: str) -> bool:
         return permission in self.permissions
 
@@ -58,11 +65,11 @@ class AuthManager:
         
         if user.tenant_id != tenant_id:
             return None
-            
+        
         tenant = self._tenants.get(tenant_id)
         if not tenant or not tenant.is_active():
             return None
-            
+        
         return user
     
     def check_permission(self, user: User, permission: str) -> bool:
@@ -4,12 +4,14 @@ Enterprise License Module
 License management and validation.
 """
 
-from typing import Optional
+from typing import Collection, Optional
 from datetime import datetime, timedelta
 from dataclasses import dataclass, field
 from enum import Enum
 import hashlib
 import secrets
+import sys
+import time
 
 
 class LicenseType(Enum):
@@ -20,6 +22,10 @@ class LicenseType(Enum):
     ENTERPRISE = "enterprise"
 
 
+# License key prefix per type
+_KEY_PREFIX = {t: t.value[:3].upper() for t in LicenseType}
+
+
 class LicenseStatus(Enum):
     """License status"""
     ACTIVE = "active"
@@ -28,7 +34,7 @@ class LicenseStatus(Enum):
     REVOKED = "revoked"
 
 
-@dataclass
+@dataclass(slots=True)
 class License:
     """License entity"""
     id: str
@@ -40,19 +46,33 @@ class License:
     issued_at: datetime
     expires_at: datetime
     features: dict = field(default_factory=dict)
+    # expires_at as epoch seconds, and the datetime it was computed from
+    _expires_ts: float = field(default=0.0, init=False, repr=False, compare=False)
+    _expires_src: Optional[datetime] = field(default=None, init=False, repr=False, compare=False)
+    
+    def __post_init__(self):
+        if type(self.tenant_id) is str:
+            self.tenant_id = sys.intern(self.tenant_id)
+    
+    def _expires_timestamp(self) -> float:
+        """expires_at as epoch seconds, recomputed when expires_at is reassigned"""
+        if self._expires_src is not self.expires_at:
+            self._expires_ts = self.expires_at.timestamp()
+            self._expires_src = self.expires_at
+        return self._expires_ts
     
-    def is_valid(self) -> bool:
-        """Check if license is valid"""
+    def is_valid(self, now: Optional[float] = None) -> bool:
+        """Check if license is valid (now: epoch seconds, shared across bulk checks)"""
         if self.status != LicenseStatus.ACTIVE:
             return False
-        return datetime.now() < self.expires_at
+        return (time.time() if now is None else now) < self._expires_timestamp()
     
-    def days_remaining(self) -> int:
-        """Get days remaining"""
-        if not self.is_valid():
+    def days_remaining(self, now: Optional[float] = None) -> int:
+        """Get days remaining (now: epoch seconds, shared across bulk checks)"""
+        if self.status != LicenseStatus.ACTIVE:
             return 0
-        delta = self.expires_at - datetime.now()
-        return max(0, delta.days)
+        remaining = self._expires_timestamp() - (time.time() if now is None else now)
+        return max(0, int(remaining // 86400))
     
     def is_feature_enabled(self, feature: str) -> bool:
         """Check if feature is enabled"""
@@ -65,6 +85,8 @@ class LicenseManager:
     def __init__(self):
         self._licenses: dict[str, License] = {}
         self._license_keys: dict[str, str] = {}  # key -> license_id
+        self._by_tenant: dict[str, list[str]] = {}  # tenant_id -> license ids, oldest first
+        self._generation = 0  # bumped whenever license state changes
     
     def generate_license_key(self, prefix: str = "ENT") -> str:
         """Generate a new license key"""
@@ -82,7 +104,8 @@ class LicenseManager:
     ) -> tuple[License, str]:
         """Create a new license"""
         license_id = secrets.token_hex(8)
-        license_key = self.generate_license_key(license_type.value[:3].upper())
+        license_key = self.generate_license_key(_KEY_PREFIX[license_type])
+        now = datetime.now()
         
         license = License(
             id=license_id,
@@ -91,13 +114,15 @@ class LicenseManager:
             status=LicenseStatus.ACTIVE,
             max_users=max_users,
             max_conversations=max_conversations,
-            issued_at=datetime.now(),
-            expires_at=datetime.now() + timedelta(days=days),
+            issued_at=now,
+            expires_at=now + timedelta(days=days),
             features=features or {}
         )
         
         self._licenses[license_id] = license
         self._license_keys[license_key] = license_id
+        self._by_tenant.setdefault(tenant_id, []).append(license_id)
+        self._generation += 1
         
         return license, license_key
     
@@ -114,19 +139,32 @@ class LicenseManager:
         if license.status == LicenseStatus.EXPIRED:
             license.status = LicenseStatus.ACTIVE
         
+        self._generation += 1
+        
         return license
     
+    @property
+    def generation(self) -> int:
+        """Counter that changes whenever a license is created, activated or revoked"""
+        return self._generation
+    
     def get_license(self, license_id: str) -> Optional[License]:
         """Get license by ID"""
         return self._licenses.get(license_id)
     
     def get_license_by_tenant(self, tenant_id: str) -> Optional[License]:
-        """Get license for a tenant"""
-        for license in self._licenses.values():
-            if license.tenant_id == tenant_id and license.is_valid():
+        """Get the tenant's oldest valid license"""
+        now = time.time()
+        for license_id in self._by_tenant.get(tenant_id, ()):
+            license = self._licenses[license_id]
+            if license.is_valid(now):
                 return license
         return None
     
+    def has_licenses(self, tenant_id: str) -> bool:
+        """Whether any license (valid or not) was ever issued to the tenant"""
+        return tenant_id in self._by_tenant
+    
     def validate_usage(self, license_id: str, user_count: int, conversation_count: int) -> bool:
         """Validate usage against license limits"""
         license = self._licenses.get(license_id)
@@ -145,12 +183,13 @@ class LicenseManager:
         license = self._licenses.get(license_id)
         if license:
             license.status = LicenseStatus.REVOKED
+            self._generation += 1
             return True
         return False
     
-    def list_licenses(self) -> list[License]:
-        """List all licenses"""
-        return list(self._licenses.values())
+    def list_licenses(self) -> Collection[License]:
+        """List all licenses (live view; copy with list() to snapshot)"""
+        return self._licenses.values()
 
 
 # Global instance
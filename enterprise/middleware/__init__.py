@@ -5,26 +5,42 @@ Request/response middleware for enterprise features.
 """
 
 from typing import Callable, Any
+from collections import deque
 from functools import wraps
 import time
 
 
-class TenantMiddleware:
+class HTTPMiddleware:
     """
-    Middleware to extract tenant information from requests.
+    Base class for ASGI middleware that only acts on HTTP scopes.
+    
+    Scope types are routed through a handler table built once at
+    construction; anything other than "http" goes straight to the app.
     """
     
     def __init__(self, app):
         self.app = app
+        self._handlers = {"http": self._http_call}
     
     async def __call__(self, scope, receive, send):
-        if scope["type"] != "http":
-            await self.app(scope, receive, send)
-            return
-        
+        await self._handlers.get(scope["type"], self.app)(scope, receive, send)
+    
+    async def _http_call(self, scope, receive, send):
+        await self.app(scope, receive, send)
+
+
+class TenantMiddleware(HTTPMiddleware):
+    """
+    Middleware to extract tenant information from requests.
+    """
+    
+    async def _http_call(self, scope, receive, send):
         # Extract tenant from headers
-        headers = dict(scope.get("headers", []))
-        tenant_id = headers.get(b"x-tenant-id", b"").decode()
+        tenant_id = ""
+        for name, value in scope.get("headers", ()):
+            if name == b"x-tenant-id":
+                tenant_id = value.decode()
+                break
         
         # Add to scope
         scope["tenant_id"] = tenant_id
@@ -32,32 +48,64 @@ class TenantMiddleware:
         await self.app(scope, receive, send)
 
 
-class LicenseMiddleware:
+class LicenseMiddleware(HTTPMiddleware):
     """
     Middleware to validate license for each request.
+    
+    Validity is cached per tenant for `ttl` seconds; the cache is dropped
+    as soon as the license manager reports a state change. Tenant ids come
+    from a client header, so tenants without any license are never cached
+    and expired entries are swept every `sweep_interval` lookups.
     """
     
-    def __init__(self, app, license_manager):
-        self.app = app
+    def __init__(self, app, license_manager, ttl: float = 1.0, sweep_interval: int = 1000):
+        super().__init__(app)
         self.license_manager = license_manager
+        self.ttl = ttl
+        self.sweep_interval = sweep_interval
+        self._cache: dict[str, tuple[float, bool]] = {}  # tenant_id -> (expiry, valid)
+        self._generation = license_manager.generation
+        self._calls = 0
     
-    async def __call__(self, scope, receive, send):
-        if scope["type"] != "http":
-            await self.app(scope, receive, send)
-            return
-        
+    async def _http_call(self, scope, receive, send):
         # Extract tenant
         tenant_id = scope.get("tenant_id", "")
         
-        if tenant_id:
-            license = self.license_manager.get_license_by_tenant(tenant_id)
-            if not license or not license.is_valid():
-                # Return 403 Forbidden
-                await self._send_403(send)
-                return
+        if tenant_id and not self._is_licensed(tenant_id):
+            # Return 403 Forbidden
+            await self._send_403(send)
+            return
         
         await self.app(scope, receive, send)
     
+    def _is_licensed(self, tenant_id: str) -> bool:
+        generation = self.license_manager.generation
+        if generation != self._generation:
+            self._cache.clear()
+            self._generation = generation
+        
+        now = time.monotonic()
+        self._calls += 1
+        if self._calls >= self.sweep_interval:
+            self._calls = 0
+            self._evict_expired(now)
+        
+        cached = self._cache.get(tenant_id)
+        if cached and now < cached[0]:
+            return cached[1]
+        
+        license = self.license_manager.get_license_by_tenant(tenant_id)
+        valid = license is not None
+        if valid or self.license_manager.has_licenses(tenant_id):
+            self._cache[tenant_id] = (now + self.ttl, valid)
+        return valid
+    
+    def _evict_expired(self, now: float) -> None:
+        """Drop cache entries past their TTL"""
+        expired = [tid for tid, (expiry, _) in self._cache.items() if expiry <= now]
+        for tid in expired:
+            del self._cache[tid]
+    
     async def _send_403(self, send):
         await send({
             "type": "http.response.start",
@@ -70,39 +118,62 @@ class LicenseMiddleware:
         })
 
 
-class RateLimitMiddleware:
+class RateLimitMiddleware(HTTPMiddleware):
     """
     Rate limiting middleware.
+    
+    Idle clients are swept from the request table every `sweep_interval`
+    requests so memory stays proportional to active clients.
     """
     
-    def __init__(self, app, max_requests: int = 100, window: int = 60):
-        self.app = app
+    def __init__(
+        self,
+        app,
+        max_requests: int = 100,
+        window: int = 60,
+        sweep_interval: int = 1000
+    ):
+        super().__init__(app)
         self.max_requests = max_requests
         self.window = window
-        self._requests = {}
+        self.sweep_interval = sweep_interval
+        self._requests: dict[str, deque] = {}
+        self._calls = 0
     
-    async def __call__(self, scope, receive, send):
-        if scope["type"] != "http":
-            await self.app(scope, receive, send)
-            return
-        
+    async def _http_call(self, scope, receive, send):
         # Get client ID
         client_id = scope.get("client", ("", 0))[0]
         
         now = time.time()
         
-        # Check rate limit
-        if client_id in self._requests:
-            requests = [t for t in self._requests[client_id] if now - t < self.window]
-            if len(requests) >= self.max_requests:
-                await self._send_429(send)
-                return
-            self._requests[client_id] = requests + [now]
-        else:
-            self._requests[client_id] = [now]
+        cutoff = now - self.window
+        
+        self._calls += 1
+        if self._calls >= self.sweep_interval:
+            self._calls = 0
+            self._evict_idle(cutoff)
+        
+        # Check rate limit (sliding window of request timestamps)
+        requests = self._requests.get(client_id)
+        if requests is None:
+            requests = self._requests[client_id] = deque()
+        
+        while requests and requests[0] <= cutoff:
+            requests.popleft()
+        
+        if len(requests) >= self.max_requests:
+            await self._send_429(send)
+            return
+        requests.append(now)
         
         await self.app(scope, receive, send)
     
+    def _evict_idle(self, cutoff: float) -> None:
+        """Drop clients with no requests inside the current window"""
+        idle = [cid for cid, reqs in self._requests.items() if not reqs or reqs[-1] <= cutoff]
+        for cid in idle:
+            del self._requests[cid]
+    
     async def _send_429(self, send):
         await send({
             "type": "http.response.start",
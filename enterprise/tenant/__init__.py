@@ -4,23 +4,27 @@ Enterprise Tenant Module
 Multi-tenant management and isolation.
 """
 
-from typing import Optional
+from typing import Collection, Mapping, Optional
 from datetime import datetime
 from dataclasses import dataclass, field
+from types import MappingProxyType
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class TenantConfig:
-    """Tenant configuration"""
+    """Tenant configuration (immutable; features is a read-only copy, left out of the hash)"""
     id: str
     name: str
     llm_provider: str
     llm_model: str
     max_users: int
     max_conversations: int
-    features: dict = field(default_factory=dict)
+    features: Mapping = field(default_factory=dict, hash=False)
     created_at: datetime = field(default_factory=datetime.now)
     
+    def __post_init__(self):
+        object.__setattr__(self, "features", MappingProxyType(dict(self.features)))
+    
     def is_feature_enabled(self, feature: str) -> bool:
         return self.features.get(feature, False)
 
@@ -39,9 +43,9 @@ class TenantManager:
         """Get tenant by ID"""
         return self._tenants.get(tenant_id)
     
-    def list_tenants(self) -> list[TenantConfig]:
-        """List all tenants"""
-        return list(self._tenants.values())
+    def list_tenants(self) -> Collection[TenantConfig]:
+        """List all tenants (live view; copy with list() to snapshot)"""
+        return self._tenants.values()
     
     def update_tenant(self, tenant_id: str, config: TenantConfig) -> bool:
         """Update tenant configuration"""
@@ -56,6 +60,10 @@ class TenantManager:
             del self._tenants[tenant_id]
             return True
         return False
+    
+    def reset(self) -> None:
+        """Remove all tenants"""
+        self._tenants.clear()
 
 
 # Global instance
@@ -4,14 +4,24 @@ Vector Memory Store
 Enterprise memory with vector search support.
 """
 
-from typing import Optional, List
+from typing import Iterable, Optional, List
 from datetime import datetime
 from dataclasses import dataclass, field
 import hashlib
-import json
+import heapq
+import math
+import sys
+
+try:
+    import numpy as np
+    
+    NUMPY_AVAILABLE = True
+except ImportError:
+    np = None
+    NUMPY_AVAILABLE = False
 
 
-@dataclass
+@dataclass(slots=True)
 class MemoryItem:
     """Memory item"""
     id: str
@@ -26,6 +36,28 @@ class MemoryItem:
     created_at: datetime = field(default_factory=datetime.now)
     updated_at: datetime = field(default_factory=datetime.now)
     last_accessed_at: Optional[datetime] = None
+    _content_lower: str = field(default="", init=False, repr=False, compare=False)
+    
+    def __post_init__(self):
+        # Tags repeat across many memories; intern so each value is stored once
+        # (sys.intern() only accepts exact str)
+        self.tags = [t if type(t) is not str else sys.intern(t) for t in self.tags]
+        self._content_lower = self.content.lower()
+
+
+def _discard(index: dict, tenant_id: str, key, memory_id: str) -> None:
+    """Remove memory_id from a tenant_id -> key -> memories posting map"""
+    postings = index.get(tenant_id, {})
+    memories = postings.get(key)
+    if memories is not None:
+        memories.pop(memory_id, None)
+        if not memories:
+            del postings[key]
+
+
+def _quantize(values):
+    """Scale unit-range float values to int8"""
+    return np.clip(np.rint(values * 127), -127, 127).astype(np.int8)
 
 
 class VectorMemoryStore:
@@ -36,15 +68,93 @@ class VectorMemoryStore:
     - Multi-tenant isolation
     - Vector similarity search
     - Hybrid search (keyword + vector)
+    
+    With quantize_embeddings=True the NumPy embedding matrix is stored as
+    int8 (scale 1/127 on unit-normalised rows), a quarter of the float32
+    footprint at a small cost in score precision.
     """
     
-    def __init__(self):
+    def __init__(self, quantize_embeddings: bool = False):
+        self.quantize_embeddings = quantize_embeddings
         self._memories = {}
-        self._tenant_index = {}
+        self._tenant_index = {}  # tenant_id -> memory_id -> MemoryItem
+        self._user_index = {}  # tenant_id -> user_id -> memory_id -> MemoryItem
+        self._type_index = {}  # tenant_id -> memory_type -> memory_id -> MemoryItem
+        self._tag_index = {}  # tenant_id -> tag -> memory ids
+        self._emb_cache = {}  # tenant_id -> (memories, normalised embedding matrix, user_ids, memory_types)
+    
+    def _index_tags(self, memory: MemoryItem) -> None:
+        """Add memory to the tenant tag index"""
+        tag_index = self._tag_index.setdefault(memory.tenant_id, {})
+        for tag in memory.tags:
+            tag_index.setdefault(tag, set()).add(memory.id)
+    
+    def _unindex_tags(self, memory: MemoryItem) -> None:
+        """Remove memory from the tenant tag index"""
+        tag_index = self._tag_index.get(memory.tenant_id, {})
+        for tag in memory.tags:
+            ids = tag_index.get(tag)
+            if ids is not None:
+                ids.discard(memory.id)
+                if not ids:
+                    del tag_index[tag]
+    
+    def _index(self, memory: MemoryItem) -> None:
+        """Add memory to the tenant, user, type and tag indexes"""
+        tenant_id = memory.tenant_id
+        self._tenant_index.setdefault(tenant_id, {})[memory.id] = memory
+        self._user_index.setdefault(tenant_id, {}).setdefault(memory.user_id, {})[memory.id] = memory
+        self._type_index.setdefault(tenant_id, {}).setdefault(memory.memory_type, {})[memory.id] = memory
+        self._index_tags(memory)
+        self._invalidate_embeddings(memory)
+    
+    def _unindex(self, memory: MemoryItem) -> None:
+        """Remove memory from the tenant, user, type and tag indexes"""
+        tenant_id = memory.tenant_id
+        self._tenant_index.get(tenant_id, {}).pop(memory.id, None)
+        _discard(self._user_index, tenant_id, memory.user_id, memory.id)
+        _discard(self._type_index, tenant_id, memory.memory_type, memory.id)
+        self._unindex_tags(memory)
+        self._invalidate_embeddings(memory)
+    
+    def _invalidate_embeddings(self, memory: MemoryItem) -> None:
+        """Drop the tenant embedding matrix if memory contributes to it"""
+        if memory.embedding:
+            self._emb_cache.pop(memory.tenant_id, None)
+    
+    def _embedding_matrix(self, tenant_id: str):
+        """
+        Tenant memories with embeddings, their row-normalised matrix, and
+        parallel user_id / memory_type columns for mask-based filtering
+        """
+        cached = self._emb_cache.get(tenant_id)
+        if cached is None:
+            memories = [m for m in self._tenant_index.get(tenant_id, {}).values() if m.embedding]
+            matrix = np.asarray([m.embedding for m in memories], dtype=np.float32)
+            if memories:
+                norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+                norms[norms == 0] = 1.0
+                matrix /= norms
+                if self.quantize_embeddings:
+                    matrix = _quantize(matrix)
+            user_ids = np.array([m.user_id for m in memories], dtype=object)
+            memory_types = np.array([m.memory_type for m in memories], dtype=object)
+            cached = self._emb_cache[tenant_id] = (memories, matrix, user_ids, memory_types)
+        return cached
     
     def _generate_id(self, content: str) -> str:
         """Generate memory ID"""
-        return hashlib.md5(content.encode()).hexdigest()[:16]
+        return hashlib.blake2b(content.encode(), digest_size=8).hexdigest()
+    
+    def _store(self, memory: MemoryItem) -> MemoryItem:
+        """Insert memory, replacing any memory with the same id"""
+        previous = self._memories.get(memory.id)
+        if previous:
+            self._unindex(previous)
+        
+        self._memories[memory.id] = memory
+        self._index(memory)
+        return memory
     
     async def add(
         self,
@@ -57,27 +167,58 @@ class VectorMemoryStore:
         embedding: List[float] = None
     ) -> MemoryItem:
         """Add a memory"""
-        memory_id = self._generate_id(content)
+        now = datetime.now()
         
-        memory = MemoryItem(
-            id=memory_id,
+        return self._store(MemoryItem(
+            id=self._generate_id(content),
             tenant_id=tenant_id,
             user_id=user_id,
             content=content,
             memory_type=memory_type,
             tags=tags or [],
             importance=importance,
-            embedding=embedding
-        )
-        
-        self._memories[memory_id] = memory
+            embedding=embedding,
+            created_at=now,
+            updated_at=now
+        ))
+    
+    async def add_many(
+        self,
+        tenant_id: str,
+        user_id: Optional[str],
+        contents: Iterable[str],
+        memory_type: str = "long_term",
+        tags: List[str] = None,
+        importance: int = 0,
+        embeddings: Iterable[List[float]] = None
+    ) -> List[MemoryItem]:
+        """
+        Add several memories for one user in a single call.
         
-        # Index by tenant
-        if tenant_id not in self._tenant_index:
-            self._tenant_index[tenant_id] = set()
-        self._tenant_index[tenant_id].add(memory_id)
+        embeddings, if given, are paired with contents in order (e.g. the
+        output of one batched encoder call).
+        """
+        now = datetime.now()
+        contents = list(contents)
+        embeddings = list(embeddings) if embeddings is not None else [None] * len(contents)
+        if len(embeddings) != len(contents):
+            raise ValueError("embeddings must match contents one-to-one")
         
-        return memory
+        return [
+            self._store(MemoryItem(
+                id=self._generate_id(content),
+                tenant_id=tenant_id,
+                user_id=user_id,
+                content=content,
+                memory_type=memory_type,
+                tags=tags or [],
+                importance=importance,
+                embedding=embedding,
+                created_at=now,
+                updated_at=now
+            ))
+            for content, embedding in zip(contents, embeddings)
+        ]
     
     async def get(self, memory_id: str) -> Optional[MemoryItem]:
         """Get memory by ID"""
@@ -101,8 +242,11 @@ class VectorMemoryStore:
         
         if content:
             memory.content = content
+            memory._content_lower = content.lower()
         if tags:
-            memory.tags = tags
+            self._unindex_tags(memory)
+            memory.tags = [t if type(t) is not str else sys.intern(t) for t in tags]
+            self._index_tags(memory)
         if importance is not None:
             memory.importance = importance
         if is_pinned is not None:
@@ -116,13 +260,8 @@ class VectorMemoryStore:
         if memory_id not in self._memories:
             return False
         
-        memory = self._memories[memory_id]
-        tenant_id = memory.tenant_id
-        
-        del self._memories[memory_id]
-        
-        if tenant_id in self._tenant_index:
-            self._tenant_index[tenant_id].discard(memory_id)
+        memory = self._memories.pop(memory_id)
+        self._unindex(memory)
         
         return True
     
@@ -137,15 +276,26 @@ class VectorMemoryStore:
     ) -> List[MemoryItem]:
         """Search memories (hybrid: keyword + tag filter)"""
         results = []
+        query_lower = query.lower() if query else None
         
-        # Get tenant memories
-        memory_ids = self._tenant_index.get(tenant_id, set())
+        # Start from the smallest matching index posting (user, type or tags)
+        tenant_memories = self._tenant_index.get(tenant_id, {})
+        postings = []
+        if user_id:
+            postings.append(self._user_index.get(tenant_id, {}).get(user_id, {}).values())
+        if memory_type:
+            postings.append(self._type_index.get(tenant_id, {}).get(memory_type, {}).values())
+        if tags:
+            tag_index = self._tag_index.get(tenant_id, {})
+            tagged_ids = set().union(*(tag_index.get(t, ()) for t in tags))
+            postings.append([tenant_memories[mid] for mid in tagged_ids])
         
-        for memory_id in memory_ids:
-            memory = self._memories.get(memory_id)
-            if not memory:
-                continue
-            
+        if postings:
+            candidates = min(postings, key=len)
+        else:
+            candidates = tenant_memories.values()
+        
+        for memory in candidates:
             # Filter by user
             if user_id and memory.user_id != user_id:
                 continue
@@ -154,22 +304,82 @@ class VectorMemoryStore:
             if memory_type and memory.memory_type != memory_type:
                 continue
             
-            # Filter by tags
-            if tags and not any(t in memory.tags for t in tags):
+            # Filter by tags (any match)
+            if tags and memory.id not in tagged_ids:
                 continue
             
             # Keyword search
-            if query:
-                query_lower = query.lower()
-                if query_lower not in memory.content.lower():
-                    continue
+            if query_lower and query_lower not in memory._content_lower:
+                continue
             
             results.append(memory)
         
-        # Sort by importance and date
-        results.sort(key=lambda m: (m.is_pinned, m.importance, m.updated_at), reverse=True)
+        # Top results by pin, importance and date
+        return heapq.nlargest(limit, results, key=lambda m: (m.is_pinned, m.importance, m.updated_at))
+    
+    async def search_by_vector(
+        self,
+        tenant_id: str,
+        embedding: List[float],
+        user_id: str = None,
+        memory_type: str = None,
+        limit: int = 10
+    ) -> List[MemoryItem]:
+        """Semantic search: memories ranked by cosine similarity to embedding"""
+        if not NUMPY_AVAILABLE:
+            return self._search_by_vector_py(tenant_id, embedding, user_id, memory_type, limit)
+        
+        memories, matrix, user_ids, memory_types = self._embedding_matrix(tenant_id)
+        query = np.asarray(embedding, dtype=np.float32)
+        query_norm = np.linalg.norm(query)
+        if not memories or limit <= 0 or query_norm == 0:
+            return []
+        
+        query = query / query_norm
+        if matrix.dtype == np.int8:
+            scores = np.matmul(matrix, _quantize(query), dtype=np.int32).astype(np.float32)
+        else:
+            scores = matrix @ query
+        
+        # Mask out memories that fail the filters
+        if user_id:
+            scores[user_ids != user_id] = -np.inf
+        if memory_type:
+            scores[memory_types != memory_type] = -np.inf
+        
+        # Top-k without sorting every score
+        k = min(limit, len(memories))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        
+        return [memories[i] for i in top if scores[i] != -np.inf]
+    
+    def _search_by_vector_py(
+        self,
+        tenant_id: str,
+        embedding: List[float],
+        user_id: str = None,
+        memory_type: str = None,
+        limit: int = 10
+    ) -> List[MemoryItem]:
+        """Pure-Python fallback for search_by_vector when NumPy is not installed"""
+        query_norm = math.sqrt(sum(x * x for x in embedding))
+        if query_norm == 0:
+            return []
+        
+        scored = []
+        for memory in self._tenant_index.get(tenant_id, {}).values():
+            if not memory.embedding:
+                continue
+            if user_id and memory.user_id != user_id:
+                continue
+            if memory_type and memory.memory_type != memory_type:
+                continue
+            norm = math.sqrt(sum(x * x for x in memory.embedding)) or 1.0
+            score = sum(x * y for x, y in zip(memory.embedding, embedding)) / norm
+            scored.append((score, memory))
         
-        return results[:limit]
+        return [m for _, m in heapq.nlargest(limit, scored, key=lambda pair: pair[0])]
     
     async def get_by_user(
         self,
@@ -178,16 +388,8 @@ class VectorMemoryStore:
         limit: int = 100
     ) -> List[MemoryItem]:
         """Get all memories for a user"""
-        memory_ids = self._tenant_index.get(tenant_id, set())
-        
-        results = []
-        for memory_id in memory_ids:
-            memory = self._memories.get(memory_id)
-            if memory and memory.user_id == user_id:
-                results.append(memory)
-        
-        results.sort(key=lambda m: m.updated_at, reverse=True)
-        return results[:limit]
+        results = self._user_index.get(tenant_id, {}).get(user_id, {}).values()
+        return heapq.nlargest(limit, results, key=lambda m: m.updated_at)
     
     async def count(
         self,
@@ -198,9 +400,12 @@ class VectorMemoryStore:
         """Count memories"""
         if not tenant_id:
             memories = self._memories.values()
+        elif user_id:
+            memories = self._user_index.get(tenant_id, {}).get(user_id, {}).values()
+        elif memory_type:
+            return len(self._type_index.get(tenant_id, {}).get(memory_type, {}))
         else:
-            memory_ids = self._tenant_index.get(tenant_id, set())
-            memories = [self._memories[mid] for mid in memory_ids if mid in self._memories]
+            return len(self._tenant_index.get(tenant_id, {}))
         
         count = 0
         for memory in memories:
@@ -214,17 +419,21 @@ class VectorMemoryStore:
     
     async def clear_user_memories(self, tenant_id: str, user_id: str) -> int:
         """Clear all memories for a user"""
-        memory_ids = list(self._tenant_index.get(tenant_id, set()))
-        deleted = 0
+        to_delete = list(self._user_index.get(tenant_id, {}).get(user_id, {}).values())
+        for memory in to_delete:
+            del self._memories[memory.id]
+            self._unindex(memory)
         
-        for memory_id in memory_ids:
-            memory = self._memories.get(memory_id)
-            if memory and memory.user_id == user_id:
-                del self._memories[memory_id]
-                self._tenant_index[tenant_id].discard(memory_id)
-                deleted += 1
-        
-        return deleted
+        return len(to_delete)
+    
+    def reset(self) -> None:
+        """Remove all memories and the cached embedding matrices"""
+        self._memories.clear()
+        self._tenant_index.clear()
+        self._user_index.clear()
+        self._type_index.clear()
+        self._tag_index.clear()
+        self._emb_cache.clear()
 
 
 class InMemoryVectorStore(VectorMemoryStore):
@@ -4,14 +4,16 @@ Skill Registry & Market
 Enterprise skill registry and market.
 """
 
-from typing import Optional, List
+from typing import Optional, List, Tuple
 from datetime import datetime
 from dataclasses import dataclass, field
+from itertools import count
 import hashlib
-import json
+import heapq
+import sys
 
 
-@dataclass
+@dataclass(slots=True)
 class Skill:
     """Skill definition"""
     id: str
@@ -23,12 +25,28 @@ class Skill:
     manifest: str = ""  # Markdown content
     is_active: bool = True
     is_public: bool = False
-    required_permissions: List[str] = field(default_factory=list)
+    required_permissions: frozenset[str] = field(default_factory=frozenset)
     author: str = ""
-    tags: List[str] = field(default_factory=list)
+    tags: Tuple[str, ...] = ()
     config: dict = field(default_factory=dict)
     created_at: datetime = field(default_factory=datetime.now)
     updated_at: datetime = field(default_factory=datetime.now)
+    _name_lower: str = field(default="", init=False, repr=False, compare=False)
+    _description_lower: str = field(default="", init=False, repr=False, compare=False)
+    _tags_set: frozenset = field(default=frozenset(), init=False, repr=False, compare=False)
+    
+    def __post_init__(self):
+        # Shared by many skills; intern so each value is stored once
+        # (sys.intern() only accepts exact str)
+        if type(self.tenant_id) is str:
+            self.tenant_id = sys.intern(self.tenant_id)
+        if type(self.namespace) is str:
+            self.namespace = sys.intern(self.namespace)
+        self._name_lower = self.name.lower()
+        self._description_lower = self.description.lower()
+        self.tags = tuple(self.tags)
+        self._tags_set = frozenset(self.tags)
+        self.required_permissions = frozenset(self.required_permissions)
 
 
 class SkillRegistry:
@@ -44,12 +62,74 @@ class SkillRegistry:
     
     def __init__(self):
         self._skills = {}
-        self._tenant_index = {}
+        self._tenant_index = {}  # tenant_id -> skill_id -> skill, least recently updated first
+        self._tag_index = {}  # tenant_id -> tag -> skill ids
+        self._token_index = {}  # name/description word -> skill ids
+        self._public = {}  # skill_id -> public skill
+        self._seq = {}  # skill_id -> update sequence number (breaks updated_at ties)
+        self._next_seq = count()
+    
+    def _index_tags(self, skill: Skill) -> None:
+        """Add skill to the tenant tag index"""
+        tag_index = self._tag_index.setdefault(skill.tenant_id, {})
+        for tag in skill.tags:
+            tag_index.setdefault(tag, set()).add(skill.id)
+    
+    def _unindex_tags(self, skill: Skill) -> None:
+        """Remove skill from the tenant tag index"""
+        tag_index = self._tag_index.get(skill.tenant_id, {})
+        for tag in skill.tags:
+            ids = tag_index.get(tag)
+            if ids is not None:
+                ids.discard(skill.id)
+                if not ids:
+                    del tag_index[tag]
+    
+    @staticmethod
+    def _tokens(skill: Skill) -> set:
+        return set(skill._name_lower.split()).union(skill._description_lower.split())
+    
+    def _index_tokens(self, skill: Skill) -> None:
+        """Add skill to the search token index"""
+        for token in self._tokens(skill):
+            self._token_index.setdefault(token, set()).add(skill.id)
+    
+    def _unindex_tokens(self, skill: Skill) -> None:
+        """Remove skill from the search token index"""
+        for token in self._tokens(skill):
+            ids = self._token_index.get(token)
+            if ids is not None:
+                ids.discard(skill.id)
+                if not ids:
+                    del self._token_index[token]
+    
+    def _query_candidates(self, query_lower: str) -> Optional[set]:
+        """
+        Ids of skills whose name or description may contain query_lower.
+        
+        Every query word must occur inside some token of a match, so only the
+        token vocabulary is scanned. Returns None for a blank query.
+        """
+        candidates = None
+        for word in query_lower.split():
+            ids = set().union(*(ids for token, ids in self._token_index.items() if word in token))
+            candidates = ids if candidates is None else candidates & ids
+            if not candidates:
+                break
+        return candidates
+    
+    def _tagged(self, tenant_id: str, tags: List[str]) -> List[Skill]:
+        """Tenant skills carrying any of the given tags"""
+        tag_index = self._tag_index.get(tenant_id, {})
+        skill_ids = set().union(*(tag_index.get(t, ()) for t in tags))
+        return [self._skills[sid] for sid in skill_ids]
     
     def _generate_id(self, tenant_id: str, name: str) -> str:
         """Generate skill ID"""
-        key = f"{tenant_id}:{name}"
-        return hashlib.md5(key.encode()).hexdigest()[:16]
+        digest = hashlib.blake2b(tenant_id.encode(), digest_size=8)
+        digest.update(b":")
+        digest.update(name.encode())
+        return digest.hexdigest()
     
     def register(
         self,
@@ -67,6 +147,7 @@ class SkillRegistry:
     ) -> Skill:
         """Register a new skill"""
         skill_id = self._generate_id(tenant_id, name)
+        now = datetime.now()
         
         skill = Skill(
             id=skill_id,
@@ -77,18 +158,32 @@ class SkillRegistry:
             version=version,
             manifest=manifest,
             is_public=is_public,
-            required_permissions=required_permissions or [],
+            required_permissions=frozenset(required_permissions or ()),
             author=author,
-            tags=tags or [],
-            config=config or {}
+            tags=tags or (),
+            config=config or {},
+            created_at=now,
+            updated_at=now
         )
         
+        previous = self._skills.get(skill_id)
+        if previous:
+            self._unindex_tags(previous)
+            self._unindex_tokens(previous)
+        
         self._skills[skill_id] = skill
+        self._index_tags(skill)
+        self._index_tokens(skill)
+        if is_public:
+            self._public[skill_id] = skill
+        else:
+            self._public.pop(skill_id, None)
         
-        # Index by tenant
-        if tenant_id not in self._tenant_index:
-            self._tenant_index[tenant_id] = {}
-        self._tenant_index[tenant_id][skill_id] = skill
+        # Index by tenant (re-registering moves the skill to the newest end)
+        self._seq[skill_id] = next(self._next_seq)
+        tenant_skills = self._tenant_index.setdefault(tenant_id, {})
+        tenant_skills.pop(skill_id, None)
+        tenant_skills[skill_id] = skill
         
         return skill
     
@@ -125,19 +220,35 @@ class SkillRegistry:
         if manifest:
             skill.manifest = manifest
         if description:
+            self._unindex_tokens(skill)
             skill.description = description
+            skill._description_lower = description.lower()
+            self._index_tokens(skill)
         if version:
             skill.version = version
         if is_active is not None:
             skill.is_active = is_active
         if is_public is not None:
             skill.is_public = is_public
+            if is_public:
+                self._public[skill_id] = skill
+            else:
+                self._public.pop(skill_id, None)
         if tags:
-            skill.tags = tags
+            self._unindex_tags(skill)
+            skill.tags = tuple(tags)
+            skill._tags_set = frozenset(tags)
+            self._index_tags(skill)
         if config:
             skill.config = config
         
         skill.updated_at = datetime.now()
+        
+        # Keep the tenant index in update order
+        self._seq[skill_id] = next(self._next_seq)
+        tenant_skills = self._tenant_index[skill.tenant_id]
+        del tenant_skills[skill_id]
+        tenant_skills[skill_id] = skill
         return True
     
     def delete(self, skill_id: str) -> bool:
@@ -149,12 +260,40 @@ class SkillRegistry:
         tenant_id = skill.tenant_id
         
         del self._skills[skill_id]
+        del self._seq[skill_id]
+        self._unindex_tags(skill)
+        self._unindex_tokens(skill)
+        self._public.pop(skill_id, None)
         
         if tenant_id in self._tenant_index:
             del self._tenant_index[tenant_id][skill_id]
         
         return True
     
+    def _iter_candidates(
+        self,
+        tenant_id: str = None,
+        include_public: bool = False,
+        tags: List[str] = None
+    ):
+        """Yield tenant skills and, optionally, public skills of other tenants matching tags"""
+        if tenant_id:
+            # Tenant's skills, narrowed through the tag index when filtering by tags
+            if tags:
+                yield from self._tagged(tenant_id, tags)
+            else:
+                yield from self._tenant_index.get(tenant_id, {}).values()
+        
+        # Public skills from other tenants (all public skills without a tenant)
+        if include_public:
+            query_tags = frozenset(tags) if tags else None
+            for skill in self._public.values():
+                if skill.tenant_id == tenant_id:
+                    continue
+                if query_tags and query_tags.isdisjoint(skill._tags_set):
+                    continue
+                yield skill
+    
     def list(
         self,
         tenant_id: str = None,
@@ -165,66 +304,68 @@ class SkillRegistry:
         limit: int = 100
     ) -> List[Skill]:
         """List skills with filters"""
-        results = []
-        
-        # Get all skills (tenant + public)
-        if tenant_id:
-            # Tenant's skills
-            tenant_skills = self._tenant_index.get(tenant_id, {})
-            results.extend(tenant_skills.values())
-            
-            # Public skills from other tenants
-            if include_public:
-                for skill in self._skills.values():
-                    if skill.is_public and skill.tenant_id != tenant_id:
-                        results.append(skill)
-        else:
-            # All public skills
-            if include_public:
-                results = [s for s in self._skills.values() if s.is_public]
+        if tenant_id and not include_public and not tags:
+            # The tenant index is already in update order: walk it newest first
+            filtered = []
+            for skill in reversed(self._tenant_index.get(tenant_id, {}).values()):
+                if len(filtered) == limit:
+                    break
+                if namespace and skill.namespace != namespace:
+                    continue
+                if is_active is not None and skill.is_active != is_active:
+                    continue
+                filtered.append(skill)
+            return filtered
         
-        # Filter
         filtered = []
-        for skill in results:
+        for skill in self._iter_candidates(tenant_id, include_public, tags):
             if namespace and skill.namespace != namespace:
                 continue
             if is_active is not None and skill.is_active != is_active:
                 continue
-            if tags and not any(t in skill.tags for t in tags):
-                continue
             filtered.append(skill)
         
-        # Sort by update time
-        filtered.sort(key=lambda s: s.updated_at, reverse=True)
-        
-        return filtered[:limit]
+        # Most recently updated first; equal timestamps in update order, as on the fast path
+        seq = self._seq
+        return heapq.nlargest(limit, filtered, key=lambda s: (s.updated_at, seq[s.id]))
     
     def search(
         self,
         tenant_id: str = None,
         query: str = None,
         tags: List[str] = None,
+        is_active: bool = None,
         limit: int = 10
     ) -> List[Skill]:
         """Search skills"""
-        # Get all relevant skills
-        all_skills = self.list(tenant_id=tenant_id, include_public=True, limit=999)
+        query_lower = query.lower() if query else None
+        matched = self._query_candidates(query_lower) if query_lower else None
+        
+        if matched is not None:
+            # Narrowed by the token index; apply tenant/public and tag visibility here
+            query_tags = frozenset(tags) if tags else None
+            candidates = (
+                skill for skill in map(self._skills.__getitem__, matched)
+                if (skill.is_public or (tenant_id and skill.tenant_id == tenant_id))
+                and not (query_tags and query_tags.isdisjoint(skill._tags_set))
+            )
+        else:
+            candidates = self._iter_candidates(tenant_id, include_public=True, tags=tags)
         
         results = []
-        for skill in all_skills:
+        for skill in candidates:
+            if is_active is not None and skill.is_active != is_active:
+                continue
+            
             # Filter by query
-            if query:
-                query_lower = query.lower()
-                if query_lower not in skill.name.lower() and query_lower not in skill.description.lower():
+            if query_lower:
+                if query_lower not in skill._name_lower and query_lower not in skill._description_lower:
                     continue
             
-            # Filter by tags
-            if tags and not any(t in skill.tags for t in tags):
-                continue
-            
             results.append(skill)
         
-        return results[:limit]
+        # Most recently updated first
+        return heapq.nlargest(limit, results, key=lambda s: s.updated_at)
     
     def check_permission(self, skill_id: str, user_permissions: List[str]) -> bool:
         """Check if user has required permissions"""
@@ -235,7 +376,7 @@ class SkillRegistry:
         if not skill.required_permissions:
             return True
         
-        return any(p in user_permissions for p in skill.required_permissions)
+        return not skill.required_permissions.isdisjoint(user_permissions)
     
     def count(self, tenant_id: str = None) -> int:
         """Count skills"""
@@ -261,18 +402,22 @@ class SkillMarket:
         limit: int = 20
     ) -> List[dict]:
         """Browse available skills"""
-        skills = self.registry.list(
-            tenant_id=tenant_id,
-            include_public=True,
-            is_active=True,
-            tags=[category] if category else None,
-            limit=limit
-        )
+        tags = [category] if category else None
         
         if query:
             skills = self.registry.search(
                 tenant_id=tenant_id,
                 query=query,
+                tags=tags,
+                is_active=True,
+                limit=limit
+            )
+        else:
+            skills = self.registry.list(
+                tenant_id=tenant_id,
+                include_public=True,
+                is_active=True,
+                tags=tags,
                 limit=limit
             )
         
@@ -284,7 +429,7 @@ class SkillMarket:
                 "description": s.description,
                 "version": s.version,
                 "author": s.author,
-                "tags": s.tags,
+                "tags": list(s.tags),
                 "is_public": s.is_public,
                 "tenant_id": s.tenant_id
             }
@@ -2,13 +2,40 @@
 Database Connection Module
 
 Database connection management with SQLite (dev) and PostgreSQL (prod) support.
+Both backends use SQLAlchemy's asyncio extension (aiosqlite / asyncpg) so
+queries never block the event loop.
 """
 
-from typing import Optional
-from contextlib import contextmanager
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, Session
+from typing import AsyncIterator, Iterable, Optional
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+import asyncio
+import zlib
+from sqlalchemy import event, text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.ext.horizontal_shard import ShardedSession
+from sqlalchemy.orm import Session
 from sqlalchemy.pool import StaticPool
+from storage.models.models import REGISTRY_TABLES, TENANT_SETTING, Base, shard_metadata
+
+# Shard holding the tenant/license registry in a sharded deployment
+GLOBAL_SHARD = "global"
+
+
+def shard_for_tenant(tenant_id: str, shard_count: int) -> str:
+    """Stable shard id for a tenant (crc32, since hash() is salted per process)"""
+    return f"shard_{zlib.crc32(tenant_id.encode()) % shard_count}"
+
+
+_SET_TENANT = text("SELECT set_config(:setting, :tenant_id, true)")
+
+
+@event.listens_for(Session, "after_begin")
+def _scope_transaction_to_tenant(session, transaction, connection):
+    """Expose only the session's tenant to PostgreSQL row-level security"""
+    tenant_id = session.info.get("tenant_id")
+    if tenant_id and connection.dialect.name == "postgresql":
+        connection.execute(_SET_TENANT, {"setting": TENANT_SETTING, "tenant_id": tenant_id})
 
 
 class DatabaseManager:
@@ -17,16 +44,26 @@ class DatabaseManager:
     def __init__(self):
         self._engine = None
         self._session_factory = None
+        self._tables_created = False
+        # Tenant shard engines by shard id (sharded deployments only)
+        self._shards = {}
+        # (session, owning task) bound by request_scope(), if any; tasks
+        # spawned inside the scope inherit it but must not use the session
+        self._current_session: ContextVar[Optional[tuple[AsyncSession, asyncio.Task]]] = ContextVar(
+            f"db_session_{id(self)}", default=None
+        )
     
     def init_sqlite(self, db_path: str = "nanobot.db"):
         """Initialize SQLite database (for development)"""
-        self._engine = create_engine(
-            f"sqlite:///{db_path}",
+        self._engine = create_async_engine(
+            f"sqlite+aiosqlite:///{db_path}",
             connect_args={"check_same_thread": False},
             poolclass=StaticPool,
             echo=False
         )
-        self._session_factory = sessionmaker(bind=self._engine)
+        self._session_factory = async_sessionmaker(self._engine, expire_on_commit=False)
+        self._tables_created = False
+        self._shards = {}
         return self
     
     def init_postgres(
@@ -35,39 +72,213 @@ class DatabaseManager:
         port: int = 5432,
         database: str = "nanobot",
         username: str = "nanobot",
-        password: str = ""
+        password: str = "",
+        pool_size: int = 10,
+        max_overflow: int = 20,
+        pool_recycle: int = 3600,
+        pool_pre_ping: bool = True,
+        pool_use_lifo: bool = True,
+        query_cache_size: int = 1200,
+        prepared_statement_cache_size: int = 500
     ):
         """Initialize PostgreSQL database (for production)"""
-        self._engine = create_engine(
-            f"postgresql://{username}:{password}@{host}:{port}/{database}",
-            pool_pre_ping=True,
-            pool_size=10,
-            max_overflow=20,
+        self._engine = create_async_engine(
+            f"postgresql+asyncpg://{username}:{password}@{host}:{port}/{database}"
+            f"?prepared_statement_cache_size={prepared_statement_cache_size}",
+            # Compiled-SQL LRU cache (SQLAlchemy default is 500 entries)
+            query_cache_size=query_cache_size,
+            pool_pre_ping=pool_pre_ping,
+            pool_size=pool_size,
+            max_overflow=max_overflow,
+            pool_recycle=pool_recycle,
+            # LIFO keeps a few hot connections busy so surplus ones age out via pool_recycle
+            pool_use_lifo=pool_use_lifo,
             echo=False
         )
-        self._session_factory = sessionmaker(bind=self._engine)
+        self._session_factory = async_sessionmaker(self._engine, expire_on_commit=False)
+        self._tables_created = False
+        self._shards = {}
+        return self
+    
+    def init_sharded(self, global_url: str, shard_urls: list[str], **engine_kwargs):
+        """
+        Initialize a horizontally sharded database.
+        
+        The tenant/license registry lives in the global database; all other
+        rows are routed to one of the shard databases by tenant_id.
+        engine_kwargs are passed to every create_async_engine() call.
+        """
+        if not shard_urls:
+            raise ValueError("At least one shard URL is required")
+        
+        self._engine = create_async_engine(global_url, **engine_kwargs)
+        self._shards = {
+            f"shard_{i}": create_async_engine(url, **engine_kwargs)
+            for i, url in enumerate(shard_urls)
+        }
+        binds = {shard_id: engine.sync_engine for shard_id, engine in self._shards.items()}
+        binds[GLOBAL_SHARD] = self._engine.sync_engine
+        self._session_factory = async_sessionmaker(
+            sync_session_class=ShardedSession,
+            shards=binds,
+            shard_chooser=self._choose_shard,
+            identity_chooser=self._choose_identity_shards,
+            execute_chooser=self._choose_execute_shards,
+            expire_on_commit=False
+        )
+        self._tables_created = False
         return self
     
-    def create_tables(self):
-        """Create all tables"""
-        from storage.models.models import Base
-        Base.metadata.create_all(self._engine)
+    @property
+    def sharded(self) -> bool:
+        """Whether tenant rows are spread over shard databases"""
+        return bool(self._shards)
+    
+    def shard_for_tenant(self, tenant_id: str) -> str:
+        """Shard holding a tenant's rows"""
+        return shard_for_tenant(tenant_id, len(self._shards))
+    
+    def bind_arguments(self, tenant_id: str) -> dict:
+        """Session.execute() bind arguments routing a Core statement to a tenant's shard"""
+        return {"shard_id": self.shard_for_tenant(tenant_id)} if self._shards else {}
+    
+    def _choose_shard(self, mapper, instance, clause=None) -> str:
+        """Shard for a flushed instance"""
+        if mapper is not None and mapper.local_table.name in REGISTRY_TABLES:
+            return GLOBAL_SHARD
+        tenant_id = getattr(instance, "tenant_id", None)
+        if not tenant_id:
+            raise ValueError(f"Cannot choose a shard for {instance!r} without a tenant_id")
+        return self.shard_for_tenant(tenant_id)
+    
+    def _choose_identity_shards(self, mapper, primary_key, *, lazy_loaded_from, **kw) -> Iterable[str]:
+        """Shards to search for a primary key lookup"""
+        if lazy_loaded_from is not None:
+            return [lazy_loaded_from.identity_token]
+        if mapper.local_table.name in REGISTRY_TABLES:
+            return [GLOBAL_SHARD]
+        for column, value in zip(mapper.primary_key, primary_key):
+            if column.key == "tenant_id":
+                return [self.shard_for_tenant(value)]
+        return list(self._shards)
     
-    @contextmanager
-    def get_session(self) -> Session:
-        """Get database session (context manager)"""
+    def _choose_execute_shards(self, context) -> Iterable[str]:
+        """Shards a statement runs on: the session's tenant shard, else fan out"""
+        pinned = context.session.info.get("shard_id")
+        if pinned:
+            return [pinned]
+        
+        tables = {mapper.local_table.name for mapper in context.all_mappers}
+        if tables and tables <= REGISTRY_TABLES:
+            return [GLOBAL_SHARD]
+        return list(self._shards)
+    
+    async def create_tables(self):
+        """Create all tables (once per engine)"""
+        if self._tables_created:
+            return
+        if not self._shards:
+            async with self._engine.begin() as conn:
+                await conn.run_sync(Base.metadata.create_all)
+        else:
+            registry = [Base.metadata.tables[name] for name in sorted(REGISTRY_TABLES)]
+            async with self._engine.begin() as conn:
+                await conn.run_sync(Base.metadata.create_all, tables=registry)
+            metadata = shard_metadata()
+            for engine in self._shards.values():
+                async with engine.begin() as conn:
+                    await conn.run_sync(metadata.create_all)
+        self._tables_created = True
+    
+    @asynccontextmanager
+    async def get_session(self, tenant_id: str = None) -> AsyncIterator[AsyncSession]:
+        """
+        Get database session (async context manager).
+        
+        Inside request_scope() the scope's session is reused and left for
+        the scope to commit; otherwise a new session is committed on exit.
+        
+        tenant_id scopes the session to one tenant: on PostgreSQL each
+        transaction sets TENANT_SETTING for the row-level security policies,
+        and when sharded, statements are pinned to the tenant's shard
+        (without it they fan out to every shard).
+        
+        Raises ValueError if tenant_id differs from the scope's tenant (a
+        scope without one, for roles that bypass row-level security, serves
+        every tenant), and RuntimeError if called from a task spawned inside
+        the scope (an AsyncSession cannot be used concurrently).
+        """
+        session = self._scoped_session(tenant_id)
+        if session is not None:
+            yield session
+            return
+        
         if not self._session_factory:
             raise RuntimeError("Database not initialized. Call init_sqlite() or init_postgres() first.")
         
-        session = self._session_factory()
+        async with self._session_factory() as session:
+            if tenant_id:
+                session.info["tenant_id"] = tenant_id
+                if self._shards:
+                    session.info["shard_id"] = self.shard_for_tenant(tenant_id)
+            try:
+                yield session
+                await session.commit()
+            except Exception:
+                await session.rollback()
+                raise
+    
+    def _scoped_session(self, tenant_id: str = None) -> Optional[AsyncSession]:
+        """The current request_scope() session, checked against tenant_id and the calling task"""
+        current = self._current_session.get()
+        if current is None:
+            return None
+        
+        session, owner = current
+        if asyncio.current_task() is not owner:
+            raise RuntimeError(
+                "request_scope() session used from another task; "
+                "open a separate request_scope() in the spawned task"
+            )
+        scope_tenant = session.info.get("tenant_id")
+        if tenant_id and scope_tenant and tenant_id != scope_tenant:
+            raise ValueError(f"Session for tenant {tenant_id!r} requested inside a request_scope() for {scope_tenant!r}")
+        return session
+    
+    @asynccontextmanager
+    async def request_scope(self, tenant_id: str = None) -> AsyncIterator[AsyncSession]:
+        """
+        Share one session and transaction across all get_session() calls
+        made within this block (e.g. one API request).
+        
+        Commits on exit, rolls back on error. Nested scopes join the outer one
+        (tenant_id must match it). Tasks spawned inside the scope cannot use
+        its session, but may open their own scope.
+        """
+        current = self._current_session.get()
+        if current is not None and current[1] is asyncio.current_task():
+            async with self.get_session(tenant_id) as session:
+                yield session
+            return
+        
+        token = self._current_session.set(None)
         try:
-            yield session
-            session.commit()
-        except Exception:
-            session.rollback()
-            raise
+            async with self.get_session(tenant_id) as session:
+                self._current_session.set((session, asyncio.current_task()))
+                yield session
         finally:
-            session.close()
+            self._current_session.reset(token)
+    
+    async def close(self):
+        """Dispose the engines and close all pooled connections"""
+        for engine in self._shards.values():
+            await engine.dispose()
+        if self._engine:
+            await self._engine.dispose()
+        self._engine = None
+        self._session_factory = None
+        self._tables_created = False
+        self._shards = {}
     
     @property
     def engine(self):
@@ -84,7 +295,7 @@ def get_db_manager() -> DatabaseManager:
     return _db_manager
 
 
-def init_database(database_url: str = None):
+async def init_database(database_url: str = None):
     """Initialize database from URL or environment"""
     if database_url:
         if database_url.startswith("postgresql"):
@@ -95,5 +306,5 @@ def init_database(database_url: str = None):
         # Default to SQLite for development
         _db_manager.init_sqlite("nanobot.db")
     
-    _db_manager.create_tables()
+    await _db_manager.create_tables()
     return _db_manager
@@ -9,10 +9,66 @@ from datetime import datetime
 from typing import Optional
 from enum import Enum as PyEnum
 from sqlalchemy import (
-    String, Integer, Boolean, DateTime, Text, ForeignKey, Enum, JSON, Index
+    String, Integer, SmallInteger, Boolean, DateTime, Text, ForeignKey, Enum, JSON, Index, Float, literal, select
 )
-from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
+from sqlalchemy import DDL, MetaData, event
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import DeclarativeBase, Mapped, defer, load_only, mapped_column, relationship
 from sqlalchemy.sql import func
+from enterprise.license import LicenseStatus, LicenseType
+
+try:
+    from pgvector.sqlalchemy import Vector
+    
+    PGVECTOR_AVAILABLE = True
+except ImportError:
+    PGVECTOR_AVAILABLE = False
+
+# Binary, indexable JSONB on PostgreSQL, plain JSON elsewhere
+JSONType = JSON().with_variant(JSONB(), "postgresql")
+
+# Embedding dimension of the pgvector column
+EMBEDDING_DIM = 1536
+
+# pgvector on PostgreSQL, JSON everywhere else (SQLite, or pgvector not installed)
+EmbeddingType = JSON().with_variant(Vector(EMBEDDING_DIM), "postgresql") if PGVECTOR_AVAILABLE else JSON
+
+# Hash partitions per tenant-partitioned table (PostgreSQL only)
+TENANT_PARTITIONS = 8
+
+# Transaction setting naming the tenant that row-level security policies expose
+TENANT_SETTING = "app.tenant_id"
+
+
+class SessionStatus(str, PyEnum):
+    """Session status"""
+    ACTIVE = "active"
+    CLOSED = "closed"
+
+
+class MessageRole(str, PyEnum):
+    """Message author role"""
+    USER = "user"
+    ASSISTANT = "assistant"
+    SYSTEM = "system"
+
+
+class MemoryType(str, PyEnum):
+    """Memory type"""
+    LONG_TERM = "long_term"
+    DAILY_LOG = "daily_log"
+    SESSION = "session"
+
+
+def _enum_type(enum_cls: type[PyEnum], name: str) -> Enum:
+    """Native PostgreSQL ENUM (CHECK constraint elsewhere) storing the member values"""
+    return Enum(
+        enum_cls,
+        name=name,
+        native_enum=True,
+        create_constraint=True,
+        values_callable=lambda members: [m.value for m in members],
+    )
 
 
 class Base(DeclarativeBase):
@@ -27,14 +83,15 @@ class TenantModel(Base):
     id: Mapped[str] = mapped_column(String(50), primary_key=True)
     name: Mapped[str] = mapped_column(String(200), nullable=False)
     license_id: Mapped[Optional[str]] = mapped_column(String(50), ForeignKey("licenses.id"), nullable=True)
-    settings: Mapped[Optional[dict]] = mapped_column(JSON, default={})
+    settings: Mapped[Optional[dict]] = mapped_column(JSONType, default=dict)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=func.now())
     updated_at: Mapped[datetime] = mapped_column(DateTime, default=func.now(), onupdate=func.now())
     
-    # Relationships
+    # Relationships (unbounded collections raise instead of lazy loading;
+    # use selectinload() at the query site when they are needed)
     license: Mapped[Optional["LicenseModel"]] = relationship("LicenseModel", back_populates="tenants")
-    users: Mapped[list["UserModel"]] = relationship("UserModel", back_populates="tenant")
-    sessions: Mapped[list["SessionModel"]] = relationship("SessionModel", back_populates="tenant")
+    users: Mapped[list["UserModel"]] = relationship("UserModel", back_populates="tenant", lazy="raise")
+    sessions: Mapped[list["SessionModel"]] = relationship("SessionModel", back_populates="tenant", lazy="raise")
 
 
 class LicenseModel(Base):
@@ -43,18 +100,20 @@ class LicenseModel(Base):
     
     id: Mapped[str] = mapped_column(String(50), primary_key=True)
     license_key: Mapped[str] = mapped_column(String(100), unique=True, nullable=False, index=True)
-    license_type: Mapped[str] = mapped_column(String(20), nullable=False)  # trial, standard, professional, enterprise
-    status: Mapped[str] = mapped_column(String(20), nullable=False, default="active")  # active, expired, suspended, revoked
+    license_type: Mapped[LicenseType] = mapped_column(_enum_type(LicenseType, "license_type"), nullable=False)
+    status: Mapped[LicenseStatus] = mapped_column(
+        _enum_type(LicenseStatus, "license_status"), nullable=False, default=LicenseStatus.ACTIVE
+    )
     max_users: Mapped[int] = mapped_column(Integer, default=10)
     max_conversations: Mapped[int] = mapped_column(Integer, default=1000)
-    features: Mapped[Optional[dict]] = mapped_column(JSON, default={})
+    features: Mapped[Optional[dict]] = mapped_column(JSONType, default=dict)
     issued_at: Mapped[datetime] = mapped_column(DateTime, default=func.now())
     expires_at: Mapped[datetime] = mapped_column(DateTime, nullable=False)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=func.now())
     updated_at: Mapped[datetime] = mapped_column(DateTime, default=func.now(), onupdate=func.now())
     
     # Relationships
-    tenants: Mapped[list["TenantModel"]] = relationship("TenantModel", back_populates="license")
+    tenants: Mapped[list["TenantModel"]] = relationship("TenantModel", back_populates="license", lazy="raise")
 
 
 class UserModel(Base):
@@ -65,16 +124,16 @@ class UserModel(Base):
     tenant_id: Mapped[str] = mapped_column(String(50), ForeignKey("tenants.id"), nullable=False, index=True)
     name: Mapped[str] = mapped_column(String(200), nullable=False)
     email: Mapped[str] = mapped_column(String(200), nullable=False, index=True)
-    permissions: Mapped[Optional[list]] = mapped_column(JSON, default=[])
-    metadata: Mapped[Optional[dict]] = mapped_column(JSON, default={})
+    permissions: Mapped[Optional[list]] = mapped_column(JSONType, default=list)
+    meta: Mapped[Optional[dict]] = mapped_column("metadata", JSONType, default=dict)  # "metadata" is reserved by DeclarativeBase
     is_active: Mapped[bool] = mapped_column(Boolean, default=True)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=func.now())
     updated_at: Mapped[datetime] = mapped_column(DateTime, default=func.now(), onupdate=func.now())
     
     # Relationships
     tenant: Mapped["TenantModel"] = relationship("TenantModel", back_populates="users")
-    sessions: Mapped[list["SessionModel"]] = relationship("SessionModel", back_populates="user")
-    memories: Mapped[list["MemoryModel"]] = relationship("MemoryModel", back_populates="user")
+    sessions: Mapped[list["SessionModel"]] = relationship("SessionModel", back_populates="user", lazy="raise")
+    memories: Mapped[list["MemoryModel"]] = relationship("MemoryModel", back_populates="user", lazy="raise")
 
 
 class SessionModel(Base):
@@ -82,57 +141,74 @@ class SessionModel(Base):
     __tablename__ = "sessions"
     
     id: Mapped[str] = mapped_column(String(50), primary_key=True)
-    tenant_id: Mapped[str] = mapped_column(String(50), ForeignKey("tenants.id"), nullable=False, index=True)
+    tenant_id: Mapped[str] = mapped_column(String(50), ForeignKey("tenants.id"), nullable=False)
     user_id: Mapped[str] = mapped_column(String(50), ForeignKey("users.id"), nullable=False, index=True)
     channel: Mapped[Optional[str]] = mapped_column(String(50), nullable=True)  # telegram, feishu, etc.
-    status: Mapped[str] = mapped_column(String(20), nullable=False, default="active")  # active, closed
+    status: Mapped[SessionStatus] = mapped_column(
+        _enum_type(SessionStatus, "session_status"), nullable=False, default=SessionStatus.ACTIVE
+    )
     messages_count: Mapped[int] = mapped_column(Integer, default=0)
-    metadata: Mapped[Optional[dict]] = mapped_column(JSON, default={})
+    meta: Mapped[Optional[dict]] = mapped_column("metadata", JSONType, default=dict)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=func.now())
     updated_at: Mapped[datetime] = mapped_column(DateTime, default=func.now(), onupdate=func.now())
     closed_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
     
-    # Relationships
+    # Relationships (the user is batch-loaded with the session; messages are
+    # unbounded, so they raise unless loaded with selectinload())
     tenant: Mapped["TenantModel"] = relationship("TenantModel", back_populates="sessions")
-    user: Mapped["UserModel"] = relationship("UserModel", back_populates="sessions")
-    messages: Mapped[list["MessageModel"]] = relationship("MessageModel", back_populates="session")
+    user: Mapped["UserModel"] = relationship("UserModel", back_populates="sessions", lazy="selectin")
+    messages: Mapped[list["MessageModel"]] = relationship("MessageModel", back_populates="session", lazy="raise")
+    
+    # Indexes (tenant_id lookups use the leftmost prefix of the composite index)
+    __table_args__ = (
+        Index('idx_sessions_tenant_user_status', 'tenant_id', 'user_id', 'status'),
+    )
 
 
 class MessageModel(Base):
     """Message model"""
     __tablename__ = "messages"
     
+    # tenant_id is part of the key because the table is partitioned by it
     id: Mapped[str] = mapped_column(String(50), primary_key=True)
+    tenant_id: Mapped[str] = mapped_column(String(50), ForeignKey("tenants.id"), primary_key=True)
     session_id: Mapped[str] = mapped_column(String(50), ForeignKey("sessions.id"), nullable=False, index=True)
-    role: Mapped[str] = mapped_column(String(20), nullable=False)  # user, assistant, system
+    role: Mapped[MessageRole] = mapped_column(_enum_type(MessageRole, "message_role"), nullable=False)
     content: Mapped[str] = mapped_column(Text, nullable=False)
-    metadata: Mapped[Optional[dict]] = mapped_column(JSON, default={})
+    meta: Mapped[Optional[dict]] = mapped_column("metadata", JSONType, default=dict)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=func.now())
     
     # Relationships
     session: Mapped["SessionModel"] = relationship("SessionModel", back_populates="messages")
+    
+    __table_args__ = (
+        {'postgresql_partition_by': 'HASH (tenant_id)'},
+    )
 
 
 class MemoryModel(Base):
     """Memory model"""
     __tablename__ = "memories"
     
+    # tenant_id is part of the key because the table is partitioned by it
     id: Mapped[str] = mapped_column(String(50), primary_key=True)
-    tenant_id: Mapped[str] = mapped_column(String(50), ForeignKey("tenants.id"), nullable=False, index=True)
+    tenant_id: Mapped[str] = mapped_column(String(50), ForeignKey("tenants.id"), primary_key=True, index=True)
     user_id: Mapped[Optional[str]] = mapped_column(String(50), ForeignKey("users.id"), nullable=True, index=True)
     session_id: Mapped[Optional[str]] = mapped_column(String(50), ForeignKey("sessions.id"), nullable=True, index=True)
     
     # Content
     content: Mapped[str] = mapped_column(Text, nullable=False)
-    memory_type: Mapped[str] = mapped_column(String(20), nullable=False, default="long_term")  # long_term, daily_log, session
+    memory_type: Mapped[MemoryType] = mapped_column(
+        _enum_type(MemoryType, "memory_type"), nullable=False, default=MemoryType.LONG_TERM
+    )
     
     # Metadata
-    tags: Mapped[Optional[list]] = mapped_column(JSON, default=[])
-    importance: Mapped[int] = mapped_column(Integer, default=0)  # 0-10
+    tags: Mapped[Optional[list]] = mapped_column(JSONType, default=list)
+    importance: Mapped[int] = mapped_column(SmallInteger, default=0)  # 0-10
     is_pinned: Mapped[bool] = mapped_column(Boolean, default=False)
     
     # Vector (for semantic search)
-    embedding: Mapped[Optional[list]] = mapped_column(JSON, nullable=True)
+    embedding: Mapped[Optional[list]] = mapped_column(EmbeddingType, nullable=True)
     
     # Timestamps
     created_at: Mapped[datetime] = mapped_column(DateTime, default=func.now())
@@ -145,9 +221,158 @@ class MemoryModel(Base):
     # Indexes
     __table_args__ = (
         Index('idx_memory_tenant_user_type', 'tenant_id', 'user_id', 'memory_type'),
+        Index('idx_memory_tags_gin', 'tags', postgresql_using='gin').ddl_if(dialect='postgresql'),
+    ) + ((
+        Index(
+            'idx_memory_embedding_hnsw',
+            'embedding',
+            postgresql_using='hnsw',
+            postgresql_with={'m': 16, 'ef_construction': 64},
+            postgresql_ops={'embedding': 'vector_cosine_ops'},
+        ).ddl_if(dialect='postgresql'),
+    ) if PGVECTOR_AVAILABLE else ()) + (
+        {'postgresql_partition_by': 'HASH (tenant_id)'},
     )
 
 
+def _create_vector_extension(metadata: MetaData) -> None:
+    """Install pgvector before the tables using its vector type are created"""
+    if PGVECTOR_AVAILABLE:
+        event.listen(metadata, "before_create", DDL(
+            "CREATE EXTENSION IF NOT EXISTS vector"
+        ).execute_if(dialect="postgresql"))
+
+
+_create_vector_extension(Base.metadata)
+
+
+def _create_tenant_partitions(table) -> None:
+    """Create the hash partitions of a tenant-partitioned table after the parent"""
+    for remainder in range(TENANT_PARTITIONS):
+        event.listen(table, "after_create", DDL(
+            f"CREATE TABLE {table.name}_p{remainder} PARTITION OF {table.name} "
+            f"FOR VALUES WITH (MODULUS {TENANT_PARTITIONS}, REMAINDER {remainder})"
+        ).execute_if(dialect="postgresql"))
+
+
+_create_tenant_partitions(MessageModel.__table__)
+_create_tenant_partitions(MemoryModel.__table__)
+
+
+def _enable_tenant_isolation(table, using: str = None) -> None:
+    """
+    Enable row-level security on a tenant-scoped table (PostgreSQL only).
+    
+    Rows are visible only to transactions whose TENANT_SETTING matches. The
+    table owner bypasses the policy unless the table is FORCEd, so the app
+    should connect as a separate role for it to be enforced.
+    """
+    own_rows = f"tenant_id = current_setting('{TENANT_SETTING}', true)"
+    using = using or own_rows
+    table.info["tenant_policy"] = using
+    event.listen(table, "after_create", DDL(
+        f"ALTER TABLE {table.name} ENABLE ROW LEVEL SECURITY"
+    ).execute_if(dialect="postgresql"))
+    # Writes are always limited to the tenant's own rows
+    event.listen(table, "after_create", DDL(
+        f"CREATE POLICY tenant_isolation ON {table.name} USING ({using}) WITH CHECK ({own_rows})"
+    ).execute_if(dialect="postgresql"))
+
+
+_enable_tenant_isolation(UserModel.__table__)
+_enable_tenant_isolation(SessionModel.__table__)
+_enable_tenant_isolation(MessageModel.__table__)
+_enable_tenant_isolation(MemoryModel.__table__)
+
+
+# Tenant registry tables; these stay in the global database when tenant data is sharded
+REGISTRY_TABLES = frozenset({"tenants", "licenses"})
+
+
+def shard_metadata() -> MetaData:
+    """
+    Schema of a tenant shard database.
+    
+    Holds every tenant-scoped table. Foreign keys into the registry tables are
+    dropped since those rows live in the global database.
+    """
+    metadata = MetaData()
+    _create_vector_extension(metadata)
+    for table in Base.metadata.sorted_tables:
+        if table.name in REGISTRY_TABLES:
+            continue
+        shard_table = table.to_metadata(metadata)
+        for constraint in list(shard_table.foreign_key_constraints):
+            if constraint.elements[0].target_fullname.split(".")[0] in REGISTRY_TABLES:
+                shard_table.constraints.discard(constraint)
+                for fk in constraint.elements:
+                    fk.parent.foreign_keys.discard(fk)
+                    shard_table.foreign_keys.discard(fk)
+        # DDL listeners are not copied by to_metadata()
+        if shard_table.dialect_options["postgresql"]["partition_by"]:
+            _create_tenant_partitions(shard_table)
+        if "tenant_policy" in shard_table.info:
+            _enable_tenant_isolation(shard_table, shard_table.info["tenant_policy"])
+    return metadata
+
+
+def nearest_memories(tenant_id: str, embedding: list[float], limit: int = 10):
+    """
+    Select a tenant's memories ordered by cosine distance to embedding.
+    
+    PostgreSQL + pgvector only: the tenant filter is applied first and the
+    ORDER BY ... LIMIT is served by the HNSW index. The embedding column is
+    not loaded, and accessing it on a result raises instead of lazy loading
+    (which an AsyncSession cannot do).
+    """
+    if not PGVECTOR_AVAILABLE:
+        raise RuntimeError("pgvector not installed. Run: pip install pgvector")
+    
+    distance = MemoryModel.embedding.op("<=>", return_type=Float)(
+        literal(embedding, Vector(EMBEDDING_DIM))
+    )
+    return (
+        select(MemoryModel)
+        .options(defer(MemoryModel.embedding, raiseload=True))
+        .where(MemoryModel.tenant_id == tenant_id, MemoryModel.embedding.is_not(None))
+        .order_by(distance)
+        .limit(limit)
+    )
+
+
+def list_memories(
+    tenant_id: str,
+    user_id: str = None,
+    memory_type: str = None,
+    limit: int = 100,
+    offset: int = 0
+):
+    """
+    Select a page of a tenant's memories, newest first.
+    
+    Only summary columns are loaded; accessing content or embedding on a
+    result raises instead of lazy loading (which an AsyncSession cannot do).
+    """
+    query = (
+        select(MemoryModel)
+        .options(load_only(
+            MemoryModel.id,
+            MemoryModel.tenant_id,
+            MemoryModel.user_id,
+            MemoryModel.memory_type,
+            MemoryModel.importance,
+            MemoryModel.created_at,
+            raiseload=True
+        ))
+        .where(MemoryModel.tenant_id == tenant_id)
+    )
+    if user_id:
+        query = query.where(MemoryModel.user_id == user_id)
+    if memory_type:
+        query = query.where(MemoryModel.memory_type == memory_type)
+    return query.order_by(MemoryModel.created_at.desc()).limit(limit).offset(offset)
+
+
 class SkillModel(Base):
     """Skill model"""
     __tablename__ = "skills"
@@ -169,12 +394,12 @@ class SkillModel(Base):
     is_public: Mapped[bool] = mapped_column(Boolean, default=False)  # Public to all tenants
     
     # Permissions
-    required_permissions: Mapped[Optional[list]] = mapped_column(JSON, default=[])
+    required_permissions: Mapped[Optional[list]] = mapped_column(JSONType, default=list)
     
     # Metadata
     author: Mapped[Optional[str]] = mapped_column(String(200), nullable=True)
-    tags: Mapped[Optional[list]] = mapped_column(JSON, default=[])
-    config: Mapped[Optional[dict]] = mapped_column(JSON, default={})
+    tags: Mapped[Optional[list]] = mapped_column(JSONType, default=list)
+    config: Mapped[Optional[dict]] = mapped_column(JSONType, default=dict)
     
     # Timestamps
     created_at: Mapped[datetime] = mapped_column(DateTime, default=func.now())
@@ -183,4 +408,26 @@ class SkillModel(Base):
     # Indexes
     __table_args__ = (
         Index('idx_skill_tenant_namespace', 'tenant_id', 'namespace'),
+        Index('idx_skill_tags_gin', 'tags', postgresql_using='gin').ddl_if(dialect='postgresql'),
+        Index(
+            'idx_skill_permissions_gin', 'required_permissions', postgresql_using='gin'
+        ).ddl_if(dialect='postgresql'),
+    )
+
+
+# Public skills are shared with every tenant
+_enable_tenant_isolation(
+    SkillModel.__table__, f"is_public OR tenant_id = current_setting('{TENANT_SETTING}', true)"
+)
+
+
+def list_skills(tenant_id: str, is_active: bool = None, limit: int = 100, offset: int = 0):
+    """Select a page of a tenant's skills; manifest and config raise if accessed"""
+    query = (
+        select(SkillModel)
+        .options(defer(SkillModel.manifest, raiseload=True), defer(SkillModel.config, raiseload=True))
+        .where(SkillModel.tenant_id == tenant_id)
     )
+    if is_active is not None:
+        query = query.where(SkillModel.is_active == is_active)
+    return query.order_by(SkillModel.updated_at.desc()).limit(limit).offset(offset)
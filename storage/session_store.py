@@ -4,13 +4,37 @@ PostgreSQL Session Storage
 Enterprise session storage with PostgreSQL.
 """
 
-from typing import Optional, List
-from datetime import datetime
-from dataclasses import dataclass
 import json
+import sys
+from dataclasses import dataclass
+from datetime import datetime
+from itertools import count, islice
+from typing import Collection, Iterable, List, Optional, Tuple
+
+try:
+    from sqlalchemy import delete, func, insert, select, update
+
+    from storage.models.models import SessionModel
+    
+    # Columns selected to build a SessionData (in field order, minus messages)
+    _SESSION_COLUMNS = (
+        SessionModel.id,
+        SessionModel.tenant_id,
+        SessionModel.user_id,
+        SessionModel.channel,
+        SessionModel.status,
+        SessionModel.meta,
+        SessionModel.created_at,
+        SessionModel.updated_at,
+    )
+    
+    SQLALCHEMY_AVAILABLE = True
+except ImportError:
+    # Only PostgreSQLSessionStore needs SQLAlchemy
+    SQLALCHEMY_AVAILABLE = False
 
 
-@dataclass
+@dataclass(slots=True)
 class SessionData:
     """Session data"""
     id: str
@@ -24,14 +48,40 @@ class SessionData:
     updated_at: datetime
 
 
+def _row_to_session(row) -> SessionData:
+    """Build SessionData from a row of _SESSION_COLUMNS"""
+    session_id, tenant_id, user_id, channel, status, metadata, created_at, updated_at = row
+    # Positional in field order; status is a SessionStatus member from the enum column
+    return SessionData(
+        session_id, tenant_id, user_id, channel, status.value, [], metadata or {}, created_at, updated_at
+    )
+
+
+def _intern(value):
+    """Intern exact str values; str subclasses (e.g. enums) and None pass through"""
+    return sys.intern(value) if type(value) is str else value
+
+
+# list() pages above this many rows are streamed from a server-side cursor
+STREAM_THRESHOLD = 500
+
+
 class PostgreSQLSessionStore:
     """
     PostgreSQL-based session storage.
     
     Replaces the default file-based session storage.
+    
+    Calls taking tenant_id run in a session scoped to that tenant (row-level
+    security setting, shard routing). The app's database role only sees rows
+    of the scoped tenant, so pass tenant_id, or call from inside
+    db.request_scope(tenant_id); unscoped calls are for roles that bypass
+    row-level security (e.g. admin tooling).
     """
     
     def __init__(self, db_manager):
+        if not SQLALCHEMY_AVAILABLE:
+            raise ImportError("SQLAlchemy not installed. Run: pip install nanobot-ai[storage]")
         self.db = db_manager
     
     async def create(
@@ -42,8 +92,6 @@ class PostgreSQLSessionStore:
         channel: str = None
     ) -> SessionData:
         """Create a new session"""
-        from storage.models.models import SessionModel
-        
         session = SessionModel(
             id=session_id,
             tenant_id=tenant_id,
@@ -51,13 +99,13 @@ class PostgreSQLSessionStore:
             channel=channel,
             status="active",
             messages_count=0,
-            metadata={}
+            meta={}
         )
         
-        with self.db.get_session() as db:
+        async with self.db.get_session(tenant_id) as db:
             db.add(session)
-            db.commit()
         
+        now = datetime.now()
         return SessionData(
             id=session_id,
             tenant_id=tenant_id,
@@ -66,65 +114,103 @@ class PostgreSQLSessionStore:
             status="active",
             messages=[],
             metadata={},
-            created_at=datetime.now(),
-            updated_at=datetime.now()
+            created_at=now,
+            updated_at=now
         )
     
-    async def get(self, session_id: str) -> Optional[SessionData]:
-        """Get session by ID"""
-        from storage.models.models import SessionModel
+    async def create_many(
+        self,
+        sessions: Iterable[Tuple[str, str, str, Optional[str]]]
+    ) -> List[SessionData]:
+        """
+        Create sessions in bulk.
         
-        with self.db.get_session() as db:
-            session = db.query(SessionModel).filter_by(id=session_id).first()
-            if not session:
-                return None
-            
-            return SessionData(
-                id=session.id,
-                tenant_id=session.tenant_id,
-                user_id=session.user_id,
-                channel=session.channel,
-                status=session.status,
+        sessions yields (session_id, tenant_id, user_id, channel) tuples. Rows
+        go out as one Core executemany INSERT per tenant, each in a session
+        scoped to that tenant (inside request_scope(), all rows must belong
+        to the scope's tenant and share its transaction).
+        """
+        now = datetime.now()
+        created = [
+            SessionData(
+                id=session_id,
+                tenant_id=tenant_id,
+                user_id=user_id,
+                channel=channel,
+                status="active",
                 messages=[],
-                metadata=session.metadata or {},
-                created_at=session.created_at,
-                updated_at=session.updated_at
+                metadata={},
+                created_at=now,
+                updated_at=now
             )
+            for session_id, tenant_id, user_id, channel in sessions
+        ]
+        if not created:
+            return created
+        
+        rows_by_tenant = {}
+        for s in created:
+            rows_by_tenant.setdefault(s.tenant_id, []).append({
+                "id": s.id,
+                "tenant_id": s.tenant_id,
+                "user_id": s.user_id,
+                "channel": s.channel,
+                "status": "active",
+                "messages_count": 0,
+                "metadata": {},
+            })
+        for tenant_id, rows in rows_by_tenant.items():
+            async with self.db.get_session(tenant_id) as db:
+                await db.execute(
+                    insert(SessionModel.__table__), rows, bind_arguments=self.db.bind_arguments(tenant_id)
+                )
+        
+        return created
+    
+    async def get(self, session_id: str, tenant_id: str = None) -> Optional[SessionData]:
+        """Get session by ID (within tenant_id, if given)"""
+        query = select(*_SESSION_COLUMNS).where(SessionModel.id == session_id)
+        if tenant_id:
+            query = query.where(SessionModel.tenant_id == tenant_id)
+        
+        async with self.db.get_session(tenant_id) as db:
+            row = (await db.execute(query)).first()
+            return _row_to_session(row) if row else None
     
     async def update(
         self,
         session_id: str,
         status: str = None,
-        metadata: dict = None
+        metadata: dict = None,
+        tenant_id: str = None
     ) -> bool:
-        """Update session"""
-        from storage.models.models import SessionModel
+        """Update session (within tenant_id, if given)"""
+        values = {}
+        if status:
+            values["status"] = status
+        if metadata:
+            values["meta"] = metadata
         
-        with self.db.get_session() as db:
-            session = db.query(SessionModel).filter_by(id=session_id).first()
-            if not session:
-                return False
-            
-            if status:
-                session.status = status
-            if metadata:
-                session.metadata = metadata
+        where = [SessionModel.id == session_id]
+        if tenant_id:
+            where.append(SessionModel.tenant_id == tenant_id)
+        
+        async with self.db.get_session(tenant_id) as db:
+            if not values:
+                return await db.scalar(select(SessionModel.id).where(*where)) is not None
             
-            db.commit()
-            return True
+            result = await db.execute(update(SessionModel).where(*where).values(**values))
+            return result.rowcount > 0
     
-    async def delete(self, session_id: str) -> bool:
-        """Delete session"""
-        from storage.models.models import SessionModel
+    async def delete(self, session_id: str, tenant_id: str = None) -> bool:
+        """Delete session (within tenant_id, if given)"""
+        where = [SessionModel.id == session_id]
+        if tenant_id:
+            where.append(SessionModel.tenant_id == tenant_id)
         
-        with self.db.get_session() as db:
-            session = db.query(SessionModel).filter_by(id=session_id).first()
-            if not session:
-                return False
-            
-            db.delete(session)
-            db.commit()
-            return True
+        async with self.db.get_session(tenant_id) as db:
+            result = await db.execute(delete(SessionModel).where(*where))
+            return result.rowcount > 0
     
     async def list(
         self,
@@ -135,34 +221,38 @@ class PostgreSQLSessionStore:
         offset: int = 0
     ) -> List[SessionData]:
         """List sessions with filters"""
-        from storage.models.models import SessionModel
+        # Plain column rows: no ORM hydration or identity-map bookkeeping
+        query = select(*_SESSION_COLUMNS)
         
-        with self.db.get_session() as db:
-            query = db.query(SessionModel)
-            
-            if tenant_id:
-                query = query.filter_by(tenant_id=tenant_id)
-            if user_id:
-                query = query.filter_by(user_id=user_id)
-            if status:
-                query = query.filter_by(status=status)
-            
-            sessions = query.offset(offset).limit(limit).all()
-            
-            return [
-                SessionData(
-                    id=s.id,
-                    tenant_id=s.tenant_id,
-                    user_id=s.user_id,
-                    channel=s.channel,
-                    status=s.status,
-                    messages=[],
-                    metadata=s.metadata or {},
-                    created_at=s.created_at,
-                    updated_at=s.updated_at
-                )
-                for s in sessions
-            ]
+        if tenant_id:
+            query = query.where(SessionModel.tenant_id == tenant_id)
+        if user_id:
+            query = query.where(SessionModel.user_id == user_id)
+        if status:
+            query = query.where(SessionModel.status == status)
+        
+        query = query.order_by(SessionModel.created_at, SessionModel.id)
+        fan_out = self.db.sharded and not tenant_id
+        if fan_out:
+            # Every shard returns its first offset + limit rows; the page is
+            # cut from their merge below
+            query = query.limit(offset + limit)
+        else:
+            query = query.offset(offset).limit(limit)
+        
+        async with self.db.get_session(tenant_id) as db:
+            if limit <= STREAM_THRESHOLD:
+                result = await db.execute(query)
+                sessions = [_row_to_session(row) for row in result]
+            else:
+                # Large pages: fetch in batches instead of buffering the whole result
+                result = await db.stream(query.execution_options(yield_per=STREAM_THRESHOLD))
+                sessions = [_row_to_session(row) async for row in result]
+        
+        if fan_out:
+            sessions.sort(key=lambda s: (s.created_at, s.id))
+            sessions = sessions[offset:offset + limit]
+        return sessions
     
     async def count(
         self,
@@ -171,28 +261,90 @@ class PostgreSQLSessionStore:
         status: str = None
     ) -> int:
         """Count sessions"""
-        from storage.models.models import SessionModel
+        query = select(func.count()).select_from(SessionModel)
         
-        with self.db.get_session() as db:
-            query = db.query(SessionModel)
-            
-            if tenant_id:
-                query = query.filter_by(tenant_id=tenant_id)
-            if user_id:
-                query = query.filter_by(user_id=user_id)
-            if status:
-                query = query.filter_by(status=status)
-            
-            return query.count()
+        if tenant_id:
+            query = query.where(SessionModel.tenant_id == tenant_id)
+        if user_id:
+            query = query.where(SessionModel.user_id == user_id)
+        if status:
+            query = query.where(SessionModel.status == status)
+        
+        async with self.db.get_session(tenant_id) as db:
+            # One count per shard when the query fans out
+            return sum(await db.scalars(query))
 
 
 class InMemorySessionStore:
     """
     In-memory session store (for testing).
+    
+    Sessions are indexed by tenant, user and status; each index maps a value
+    to a {session_id: None} dict. Filtered results are returned in creation
+    order, tracked by a per-session sequence number.
     """
     
     def __init__(self):
         self._sessions = {}
+        self._seq = {}  # session_id -> creation sequence number
+        self._next_seq = count()
+        self._by_tenant = {}
+        self._by_user = {}
+        self._by_status = {}
+    
+    @staticmethod
+    def _index_add(index: dict, key: str, session_id: str) -> None:
+        index.setdefault(key, {})[session_id] = None
+    
+    @staticmethod
+    def _index_remove(index: dict, key: str, session_id: str) -> None:
+        ids = index.get(key)
+        if ids is not None:
+            ids.pop(session_id, None)
+            if not ids:
+                del index[key]
+    
+    def _index(self, session: SessionData) -> None:
+        self._index_add(self._by_tenant, session.tenant_id, session.id)
+        self._index_add(self._by_user, session.user_id, session.id)
+        self._index_add(self._by_status, session.status, session.id)
+    
+    def _unindex(self, session: SessionData) -> None:
+        self._index_remove(self._by_tenant, session.tenant_id, session.id)
+        self._index_remove(self._by_user, session.user_id, session.id)
+        self._index_remove(self._by_status, session.status, session.id)
+    
+    def _matching_ids(
+        self,
+        tenant_id: str = None,
+        user_id: str = None,
+        status: str = None,
+        ordered: bool = True
+    ) -> Collection[str]:
+        """Session ids matching all given filters (in creation order if ordered)"""
+        filters = [
+            index.get(key, {})
+            for index, key in (
+                (self._by_tenant, tenant_id),
+                (self._by_user, user_id),
+                (self._by_status, status),
+            )
+            if key
+        ]
+        if not filters:
+            return self._sessions.keys()
+        
+        # Walk the smallest index, probe the others. Index order can differ
+        # from creation order (status changes move a session to the end of
+        # its new bucket), so sort by sequence; mostly-sorted input is cheap
+        filters.sort(key=len)
+        base, rest = filters[0], filters[1:]
+        if not rest and not ordered:
+            return base.keys()
+        ids = [sid for sid in base if all(sid in other for other in rest)]
+        if ordered:
+            ids.sort(key=self._seq.__getitem__)
+        return ids
     
     async def create(
         self,
@@ -201,40 +353,67 @@ class InMemorySessionStore:
         user_id: str,
         channel: str = None
     ) -> SessionData:
+        now = datetime.now()
+        # Tenant and channel values repeat across many sessions; share one str each
         session = SessionData(
             id=session_id,
-            tenant_id=tenant_id,
+            tenant_id=_intern(tenant_id),
             user_id=user_id,
-            channel=channel,
+            channel=_intern(channel),
             status="active",
             messages=[],
             metadata={},
-            created_at=datetime.now(),
-            updated_at=datetime.now()
+            created_at=now,
+            updated_at=now
         )
+        previous = self._sessions.get(session_id)
+        if previous:
+            self._unindex(previous)
+        else:
+            self._seq[session_id] = next(self._next_seq)
         self._sessions[session_id] = session
+        self._index(session)
+        return session
+    
+    async def create_many(
+        self,
+        sessions: Iterable[Tuple[str, str, str, Optional[str]]]
+    ) -> List[SessionData]:
+        return [await self.create(*session) for session in sessions]
+    
+    def _get(self, session_id: str, tenant_id: str = None) -> Optional[SessionData]:
+        session = self._sessions.get(session_id)
+        if session and tenant_id and session.tenant_id != tenant_id:
+            return None
         return session
     
-    async def get(self, session_id: str) -> Optional[SessionData]:
-        return self._sessions.get(session_id)
+    async def get(self, session_id: str, tenant_id: str = None) -> Optional[SessionData]:
+        return self._get(session_id, tenant_id)
     
     async def update(
         self,
         session_id: str,
         status: str = None,
-        metadata: dict = None
+        metadata: dict = None,
+        tenant_id: str = None
     ) -> bool:
-        if session_id not in self._sessions:
+        session = self._get(session_id, tenant_id)
+        if not session:
             return False
-        if status:
-            self._sessions[session_id].status = status
+        if status and status != session.status:
+            self._index_remove(self._by_status, session.status, session_id)
+            session.status = status = _intern(status)
+            self._index_add(self._by_status, status, session_id)
         if metadata:
-            self._sessions[session_id].metadata = metadata
+            session.metadata = metadata
         return True
     
-    async def delete(self, session_id: str) -> bool:
-        if session_id in self._sessions:
+    async def delete(self, session_id: str, tenant_id: str = None) -> bool:
+        session = self._get(session_id, tenant_id)
+        if session:
             del self._sessions[session_id]
+            del self._seq[session_id]
+            self._unindex(session)
             return True
         return False
     
@@ -246,16 +425,8 @@ class InMemorySessionStore:
         limit: int = 100,
         offset: int = 0
     ) -> List[SessionData]:
-        results = list(self._sessions.values())
-        
-        if tenant_id:
-            results = [s for s in results if s.tenant_id == tenant_id]
-        if user_id:
-            results = [s for s in results if s.user_id == user_id]
-        if status:
-            results = [s for s in results if s.status == status]
-        
-        return results[offset:offset+limit]
+        ids = self._matching_ids(tenant_id, user_id, status)
+        return [self._sessions[sid] for sid in islice(ids, offset, offset + limit)]
     
     async def count(
         self,
@@ -263,5 +434,4 @@ class InMemorySessionStore:
         user_id: str = None,
         status: str = None
     ) -> int:
-        sessions = await self.list(tenant_id, user_id, status, limit=999999)
-        return len(sessions)
+        return len(self._matching_ids(tenant_id, user_id, status, ordered=False))
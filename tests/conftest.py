@@ -0,0 +1,140 @@
+"""
+Shared Test Fixtures
+
+Fresh managers and stores for each test, plus immutable enterprise
+entities shared by the whole test session.
+"""
+
+import os
+import sys
+from datetime import datetime
+
+import pytest
+
+try:
+    import uvloop
+    
+    UVLOOP_AVAILABLE = True
+except ImportError:
+    uvloop = None
+    UVLOOP_AVAILABLE = False
+
+# Add project root to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from enterprise.auth import AuthManager, Tenant, User
+from enterprise.license import LicenseManager
+from enterprise.tenant import TenantManager
+from skills.market import SkillMarket, SkillRegistry
+from storage.session_store import InMemorySessionStore
+
+if UVLOOP_AVAILABLE:
+    def pytest_asyncio_loop_factories(config, item):
+        """Run async tests on uvloop when it is installed"""
+        return {"uvloop": uvloop.new_event_loop}
+
+
+@pytest.fixture
+def store():
+    return InMemorySessionStore()
+
+
+@pytest.fixture
+async def db(tmp_path):
+    """SQLite-backed DatabaseManager with all tables created"""
+    pytest.importorskip("aiosqlite")
+    from storage.database import DatabaseManager
+    
+    manager = DatabaseManager().init_sqlite(str(tmp_path / "nanobot.db"))
+    await manager.create_tables()
+    yield manager
+    await manager.close()
+
+
+@pytest.fixture
+def sql_store(db):
+    from storage.session_store import PostgreSQLSessionStore
+    
+    return PostgreSQLSessionStore(db)
+
+
+@pytest.fixture
+def registry():
+    return SkillRegistry()
+
+
+@pytest.fixture
+def market(registry):
+    return SkillMarket(registry)
+
+
+@pytest.fixture(scope="module")
+def _tenant_manager():
+    return TenantManager()
+
+
+@pytest.fixture
+def tm(_tenant_manager):
+    """Module-wide TenantManager, emptied after each test"""
+    yield _tenant_manager
+    _tenant_manager.reset()
+
+
+@pytest.fixture
+def am():
+    return AuthManager()
+
+
+@pytest.fixture
+def lm():
+    return LicenseManager()
+
+
+@pytest.fixture(scope="session")
+def now():
+    """Frozen clock so time-dependent assertions are deterministic"""
+    return datetime(2024, 1, 1, 12, 0, 0)
+
+
+@pytest.fixture(scope="session")
+def active_tenant(now):
+    return Tenant(
+        id="test_tenant",
+        name="Test Tenant",
+        created_at=now,
+        settings={"active": True}
+    )
+
+
+@pytest.fixture(scope="session")
+def inactive_tenant(now):
+    return Tenant(
+        id="inactive_tenant",
+        name="Inactive Tenant",
+        created_at=now,
+        settings={"active": False}
+    )
+
+
+@pytest.fixture(scope="session")
+def read_write_user(now):
+    return User(
+        id="user_001",
+        tenant_id="test_tenant",
+        name="Test User",
+        email="test@example.com",
+        permissions=frozenset({"read", "write"}),
+        created_at=now
+    )
+
+
+@pytest.fixture(scope="session")
+def inactive_tenant_user(now):
+    return User(
+        id="user_002",
+        tenant_id="inactive_tenant",
+        name="Inactive User",
+        email="inactive@example.com",
+        permissions=frozenset(),
+        created_at=now
+    )
@@ -5,25 +5,19 @@ Tests for Phase 2 enterprise features: Auth, Tenant, License, Storage.
 """
 
 import pytest
-from datetime import datetime, timedelta
-import sys
-import os
+from datetime import timedelta
 
-# Add project root to path
-sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-
-from enterprise.auth import AuthManager, Tenant, User
-from enterprise.tenant import TenantManager, TenantConfig
-from enterprise.license import LicenseManager, LicenseType, LicenseStatus
+from enterprise.tenant import TenantConfig
+from enterprise.license import LicenseType, LicenseStatus
+from enterprise.middleware import LicenseMiddleware, RateLimitMiddleware, TenantMiddleware
 
 
 class TestTenantManager:
     """Tenant Manager Tests"""
     
-    def test_create_tenant(self):
-        """Test creating a tenant"""
-        tm = TenantManager()
-        config = TenantConfig(
+    @pytest.fixture(scope="module")
+    def default_config(self):
+        return TenantConfig(
             id="test_company",
             name="Test Company",
             llm_provider="openai",
@@ -31,31 +25,24 @@ class TestTenantManager:
             max_users=50,
             max_conversations=500
         )
-        tm.create_tenant(config)
+    
+    def test_create_tenant(self, tm, default_config):
+        """Test creating a tenant"""
+        tm.create_tenant(default_config)
         
         tenant = tm.get_tenant("test_company")
         assert tenant is not None
         assert tenant.name == "Test Company"
         assert tenant.max_users == 50
     
-    def test_get_tenant_not_found(self):
+    def test_get_tenant_not_found(self, tm):
         """Test getting non-existent tenant"""
-        tm = TenantManager()
         tenant = tm.get_tenant("nonexistent")
         assert tenant is None
     
-    def test_update_tenant(self):
+    def test_update_tenant(self, tm, default_config):
         """Test updating tenant"""
-        tm = TenantManager()
-        config = TenantConfig(
-            id="test_company",
-            name="Test Company",
-            llm_provider="openai",
-            llm_model="gpt-4",
-            max_users=50,
-            max_conversations=500
-        )
-        tm.create_tenant(config)
+        tm.create_tenant(default_config)
         
         # Update
         new_config = TenantConfig(
@@ -73,109 +60,88 @@ class TestTenantManager:
         assert tenant.name == "Updated Company"
         assert tenant.max_users == 100
     
-    def test_delete_tenant(self):
-        """Test deleting tenant"""
-        tm = TenantManager()
+    def test_config_is_immutable_and_hashable(self):
+        """Test TenantConfig copies features read-only and can be hashed"""
+        features = {"sso": True}
         config = TenantConfig(
             id="test_company",
             name="Test Company",
             llm_provider="openai",
             llm_model="gpt-4",
             max_users=50,
-            max_conversations=500
+            max_conversations=500,
+            features=features
         )
-        tm.create_tenant(config)
+        features["sso"] = False
+        
+        assert config.is_feature_enabled("sso") is True
+        with pytest.raises(TypeError):
+            config.features["sso"] = False
+        assert {config: 1}[config] == 1
+    
+    def test_delete_tenant(self, tm, default_config):
+        """Test deleting tenant"""
+        tm.create_tenant(default_config)
         
         result = tm.delete_tenant("test_company")
         assert result is True
         assert tm.get_tenant("test_company") is None
+    
+    def test_reset(self, tm, default_config):
+        """Test reset removes all tenants"""
+        tm.create_tenant(default_config)
+        
+        tm.reset()
+        
+        assert list(tm.list_tenants()) == []
 
 
 class TestAuthManager:
     """Auth Manager Tests"""
     
-    def test_register_tenant(self):
+    def test_register_tenant(self, am, active_tenant, read_write_user):
         """Test registering a tenant"""
-        am = AuthManager()
-        tenant = Tenant(
-            id="test_tenant",
-            name="Test Tenant",
-            created_at=datetime.now(),
-            settings={"active": True}
-        )
-        am.register_tenant(tenant)
+        am.register_tenant(active_tenant)
         
         # Verify by attempting auth
-        user = User(
-            id="user_001",
-            tenant_id="test_tenant",
-            name="Test User",
-            email="test@example.com",
-            permissions=["read"],
-            created_at=datetime.now()
-        )
-        am.register_user(user)
+        am.register_user(read_write_user)
         
         authenticated = am.authenticate("user_001", "test_tenant")
         assert authenticated is not None
         assert authenticated.name == "Test User"
     
-    def test_authenticate_invalid_user(self):
+    def test_authenticate_invalid_user(self, am):
         """Test authenticating invalid user"""
-        am = AuthManager()
         result = am.authenticate("invalid_user", "invalid_tenant")
         assert result is None
     
-    def test_authenticate_inactive_tenant(self):
+    def test_authenticate_inactive_tenant(self, am, inactive_tenant, inactive_tenant_user):
         """Test authenticating with inactive tenant"""
-        am = AuthManager()
-        
-        # Register tenant as inactive
-        tenant = Tenant(
-            id="inactive_tenant",
-            name="Inactive Tenant",
-            created_at=datetime.now(),
-            settings={"active": False}
-        )
-        am.register_tenant(tenant)
-        
-        user = User(
-            id="user_001",
-            tenant_id="inactive_tenant",
-            name="Test User",
-            email="test@example.com",
-            permissions=[],
-            created_at=datetime.now()
-        )
-        am.register_user(user)
+        am.register_tenant(inactive_tenant)
+        am.register_user(inactive_tenant_user)
         
-        result = am.authenticate("user_001", "inactive_tenant")
+        result = am.authenticate("user_002", "inactive_tenant")
         assert result is None
     
-    def test_check_permission(self):
+    def test_tenant_is_immutable_and_hashable(self, active_tenant):
+        """Test Tenant settings are read-only and the tenant can be hashed"""
+        with pytest.raises(TypeError):
+            active_tenant.settings["active"] = False
+        assert active_tenant.is_active() is True
+        assert hash(active_tenant) == hash(active_tenant)
+    
+    def test_check_permission(self, am, read_write_user):
         """Test permission checking"""
-        am = AuthManager()
-        
-        user = User(
-            id="user_001",
-            tenant_id="test_tenant",
-            name="Test User",
-            email="test@example.com",
-            permissions=["read", "write"],
-            created_at=datetime.now()
-        )
-        
-        assert am.check_permission(user, "read") is True
-        assert am.check_permission(user, "write") is True
-        assert am.check_permission(user, "admin") is False
+        assert am.check_permission(read_write_user, "read") is True
+        assert am.check_permission(read_write_user, "write") is True
+        assert am.check_permission(read_write_user, "admin") is False
 
 
 class TestLicenseManager:
     """License Manager Tests"""
     
-    def test_create_license(self):
+    def test_create_license(self, lm):
         """Test creating a license"""
-        lm = LicenseManager()
         license, key = lm.create_license(
             tenant_id="test_tenant",
             license_type=LicenseType.STANDARD,
@@ -191,9 +157,8 @@ class TestLicenseManager:
         assert license.max_users == 10
         assert license.is_valid() is True
     
-    def test_activate_license(self):
+    def test_activate_license(self, lm):
         """Test activating a license"""
-        lm = LicenseManager()
         license, key = lm.create_license(
             tenant_id="test_tenant",
             license_type=LicenseType.TRIAL,
@@ -206,9 +171,8 @@ class TestLicenseManager:
         assert activated is not None
         assert activated.is_valid() is True
     
-    def test_get_license_by_tenant(self):
+    def test_get_license_by_tenant(self, lm):
         """Test getting license by tenant"""
-        lm = LicenseManager()
         license, _ = lm.create_license(
             tenant_id="test_tenant",
             license_type=LicenseType.PROFESSIONAL,
@@ -221,9 +185,37 @@ class TestLicenseManager:
         assert found is not None
         assert found.license_type == LicenseType.PROFESSIONAL
     
-    def test_validate_usage_within_limit(self):
+    def test_get_license_by_tenant_after_revoke(self, lm):
+        """Test revoked license is no longer returned for tenant"""
+        license, _ = lm.create_license(
+            tenant_id="test_tenant",
+            license_type=LicenseType.STANDARD,
+            max_users=10,
+            max_conversations=100,
+            days=30
+        )
+        
+        lm.revoke_license(license.id)
+        
+        assert lm.get_license_by_tenant("test_tenant") is None
+        assert lm.get_license_by_tenant("other_tenant") is None
+    
+    def test_get_license_by_tenant_with_two_licenses(self, lm):
+        """Test an older valid license is still found after a newer one is revoked or expired"""
+        older, _ = lm.create_license("test_tenant", LicenseType.STANDARD, 10, 100, 30)
+        newer, _ = lm.create_license("test_tenant", LicenseType.PROFESSIONAL, 50, 1000, 365)
+        lm.create_license("test_tenant", LicenseType.TRIAL, 5, 10, 0)
+        
+        assert lm.get_license_by_tenant("test_tenant") is older
+        
+        lm.revoke_license(older.id)
+        assert lm.get_license_by_tenant("test_tenant") is newer
+        
+        lm.revoke_license(newer.id)
+        assert lm.get_license_by_tenant("test_tenant") is None
+    
+    def test_validate_usage_within_limit(self, lm):
         """Test usage validation within limits"""
-        lm = LicenseManager()
         license, _ = lm.create_license(
             tenant_id="test_tenant",
             license_type=LicenseType.STANDARD,
@@ -235,9 +227,8 @@ class TestLicenseManager:
         result = lm.validate_usage(license.id, 5, 50)
         assert result is True
     
-    def test_validate_usage_exceeds_limit(self):
+    def test_validate_usage_exceeds_limit(self, lm):
         """Test usage validation exceeding limits"""
-        lm = LicenseManager()
         license, _ = lm.create_license(
             tenant_id="test_tenant",
             license_type=LicenseType.STANDARD,
@@ -254,9 +245,8 @@ class TestLicenseManager:
         result = lm.validate_usage(license.id, 5, 200)
         assert result is False
     
-    def test_revoke_license(self):
+    def test_revoke_license(self, lm):
         """Test revoking a license"""
-        lm = LicenseManager()
         license, _ = lm.create_license(
             tenant_id="test_tenant",
             license_type=LicenseType.STANDARD,
@@ -273,9 +263,8 @@ class TestLicenseManager:
         assert lic.status == LicenseStatus.REVOKED
         assert lic.is_valid() is False
     
-    def test_list_licenses(self):
+    def test_list_licenses(self, lm):
         """Test listing all licenses"""
-        lm = LicenseManager()
         lm.create_license("tenant1", LicenseType.TRIAL, 5, 100, 14)
         lm.create_license("tenant2", LicenseType.STANDARD, 10, 1000, 30)
         lm.create_license("tenant3", LicenseType.PROFESSIONAL, 50, 10000, 365)
@@ -287,7 +276,7 @@ class TestLicenseManager:
 class TestLicense:
     """License Entity Tests"""
     
-    def test_is_valid_active(self):
+    def test_is_valid_active(self, now):
         """Test valid active license"""
         from enterprise.license import License
         license = License(
@@ -297,12 +286,12 @@ class TestLicense:
             status=LicenseStatus.ACTIVE,
             max_users=10,
             max_conversations=100,
-            issued_at=datetime.now(),
-            expires_at=datetime.now() + timedelta(days=30)
+            issued_at=now,
+            expires_at=now + timedelta(days=30)
         )
-        assert license.is_valid() is True
+        assert license.is_valid(now.timestamp()) is True
     
-    def test_is_valid_expired(self):
+    def test_is_valid_expired(self, now):
         """Test expired license"""
         from enterprise.license import License
         license = License(
@@ -312,12 +301,32 @@ class TestLicense:
             status=LicenseStatus.ACTIVE,
             max_users=10,
             max_conversations=100,
-            issued_at=datetime.now() - timedelta(days=60),
-            expires_at=datetime.now() - timedelta(days=30)
+            issued_at=now - timedelta(days=60),
+            expires_at=now - timedelta(days=30)
         )
-        assert license.is_valid() is False
+        assert license.is_valid(now.timestamp()) is False
     
-    def test_is_valid_revoked(self):
+    def test_is_valid_after_expiry_change(self, now):
+        """Test reassigning expires_at is picked up by later checks"""
+        from enterprise.license import License
+        license = License(
+            id="test",
+            tenant_id="tenant",
+            license_type=LicenseType.STANDARD,
+            status=LicenseStatus.ACTIVE,
+            max_users=10,
+            max_conversations=100,
+            issued_at=now - timedelta(days=60),
+            expires_at=now - timedelta(days=30)
+        )
+        assert license.is_valid(now.timestamp()) is False
+        
+        license.expires_at = now + timedelta(days=30)
+        
+        assert license.is_valid(now.timestamp()) is True
+        assert license.days_remaining(now.timestamp()) == 30
+    
+    def test_is_valid_revoked(self, now):
         """Test revoked license"""
         from enterprise.license import License
         license = License(
@@ -327,12 +336,12 @@ class TestLicense:
             status=LicenseStatus.REVOKED,
             max_users=10,
             max_conversations=100,
-            issued_at=datetime.now(),
-            expires_at=datetime.now() + timedelta(days=30)
+            issued_at=now,
+            expires_at=now + timedelta(days=30)
         )
-        assert license.is_valid() is False
+        assert license.is_valid(now.timestamp()) is False
     
-    def test_days_remaining(self):
+    def test_days_remaining(self, now):
         """Test days remaining calculation"""
         from enterprise.license import License
         license = License(
@@ -342,13 +351,31 @@ class TestLicense:
             status=LicenseStatus.ACTIVE,
             max_users=10,
             max_conversations=100,
-            issued_at=datetime.now(),
-            expires_at=datetime.now() + timedelta(days=15)
+            issued_at=now,
+            expires_at=now + timedelta(days=15)
         )
-        days = license.days_remaining()
-        assert 14 <= days <= 15
+        assert license.days_remaining(now.timestamp()) == 15
     
-    def test_is_feature_enabled(self):
+    def test_validity_at_shared_timestamp(self, now):
+        """Test validity and days remaining against a caller-supplied time"""
+        from enterprise.license import License
+        license = License(
+            id="test",
+            tenant_id="tenant",
+            license_type=LicenseType.STANDARD,
+            status=LicenseStatus.ACTIVE,
+            max_users=10,
+            max_conversations=100,
+            issued_at=now,
+            expires_at=now + timedelta(days=30)
+        )
+        later = (now + timedelta(days=10)).timestamp()
+        
+        assert license.is_valid(later) is True
+        assert license.days_remaining(later) == 20
+        assert license.is_valid((now + timedelta(days=31)).timestamp()) is False
+    
+    def test_is_feature_enabled(self, now):
         """Test feature flag checking"""
         from enterprise.license import License
         license = License(
@@ -358,8 +385,8 @@ class TestLicense:
             status=LicenseStatus.ACTIVE,
             max_users=10,
             max_conversations=100,
-            issued_at=datetime.now(),
-            expires_at=datetime.now() + timedelta(days=30),
+            issued_at=now,
+            expires_at=now + timedelta(days=30),
             features={"vector_search": True, "custom_branding": False}
         )
         assert license.is_feature_enabled("vector_search") is True
@@ -367,5 +394,110 @@ class TestLicense:
         assert license.is_feature_enabled("nonexistent") is False
 
 
+async def _noop_app(scope, receive, send):
+    pass
+
+
+async def _request(middleware, **scope):
+    """Send a fake HTTP request through middleware and return the status"""
+    sent = []
+    
+    async def send(message):
+        sent.append(message)
+    
+    await middleware({"type": "http", **scope}, None, send)
+    return sent[0]["status"] if sent else 200
+
+
+class TestTenantMiddleware:
+    """Tenant Middleware Tests"""
+    
+    @pytest.mark.asyncio
+    async def test_extract_tenant_header(self):
+        """Test tenant id is read from the x-tenant-id header"""
+        scopes = []
+        
+        async def app(scope, receive, send):
+            scopes.append(scope)
+        
+        middleware = TenantMiddleware(app)
+        await _request(middleware, headers=[(b"host", b"x"), (b"x-tenant-id", b"tenant_a")])
+        await _request(middleware, headers=[(b"host", b"x")])
+        
+        assert scopes[0]["tenant_id"] == "tenant_a"
+        assert scopes[1]["tenant_id"] == ""
+
+
+class TestLicenseMiddleware:
+    """License Middleware Tests"""
+    
+    @pytest.mark.asyncio
+    async def test_revoke_invalidates_cache(self, lm):
+        """Test cached validity is dropped when a license is revoked"""
+        license, _ = lm.create_license("tenant_a", LicenseType.STANDARD, 10, 100, 30)
+        middleware = LicenseMiddleware(_noop_app, lm, ttl=60)
+        
+        assert await _request(middleware, tenant_id="tenant_a") == 200
+        assert await _request(middleware, tenant_id="tenant_b") == 403
+        
+        lm.revoke_license(license.id)
+        
+        assert await _request(middleware, tenant_id="tenant_a") == 403
+    
+    @pytest.mark.asyncio
+    async def test_cache_stays_bounded(self, lm):
+        """Test unlicensed tenant ids are not cached and expired entries are swept"""
+        for i in range(20):
+            lm.create_license(f"tenant_{i}", LicenseType.STANDARD, 10, 100)
+        middleware = LicenseMiddleware(_noop_app, lm, ttl=0, sweep_interval=10)
+        
+        for i in range(5000):
+            assert await _request(middleware, tenant_id=f"bogus_{i}") == 403
+        assert middleware._cache == {}
+        
+        for i in range(20):
+            assert await _request(middleware, tenant_id=f"tenant_{i}") == 200
+        assert len(middleware._cache) < 10
+    
+    @pytest.mark.asyncio
+    async def test_non_http_scope_passes_through(self, lm):
+        """Test non-HTTP scopes skip license checks"""
+        called = []
+        
+        async def app(scope, receive, send):
+            called.append(scope["type"])
+        
+        middleware = LicenseMiddleware(app, lm)
+        await middleware({"type": "websocket", "tenant_id": "unlicensed"}, None, None)
+        
+        assert called == ["websocket"]
+
+
+class TestRateLimitMiddleware:
+    """Rate Limit Middleware Tests"""
+    
+    @pytest.mark.asyncio
+    async def test_rate_limit_exceeded(self):
+        """Test requests over the limit are rejected per client"""
+        middleware = RateLimitMiddleware(_noop_app, max_requests=2, window=60)
+        
+        assert await _request(middleware, client=("1.1.1.1", 0)) == 200
+        assert await _request(middleware, client=("1.1.1.1", 0)) == 200
+        assert await _request(middleware, client=("1.1.1.1", 0)) == 429
+        assert await _request(middleware, client=("2.2.2.2", 0)) == 200
+    
+    @pytest.mark.asyncio
+    async def test_idle_clients_evicted(self):
+        """Test clients outside the window are swept from the table"""
+        middleware = RateLimitMiddleware(_noop_app, max_requests=10, window=60, sweep_interval=2)
+        
+        await _request(middleware, client=("1.1.1.1", 0))
+        middleware._requests["1.1.1.1"][0] -= 120
+        await _request(middleware, client=("2.2.2.2", 0))
+        
+        assert "1.1.1.1" not in middleware._requests
+        assert "2.2.2.2" in middleware._requests
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
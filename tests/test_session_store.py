@@ -4,22 +4,16 @@ Session Store Tests
 Tests for PostgreSQL session storage.
 """
 
-import pytest
-import sys
-import os
+import asyncio
 
-sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import pytest
 
-from storage.session_store import InMemorySessionStore, SessionData
+from storage.session_store import STREAM_THRESHOLD, SessionData
 
 
 class TestInMemorySessionStore:
     """In-Memory Session Store Tests"""
     
-    @pytest.fixture
-    def store(self):
-        return InMemorySessionStore()
-    
     @pytest.mark.asyncio
     async def test_create_session(self, store):
         """Test creating a session"""
@@ -36,6 +30,18 @@ class TestInMemorySessionStore:
         assert session.user_id == "user_001"
         assert session.status == "active"
     
+    @pytest.mark.asyncio
+    async def test_create_many_sessions(self, store):
+        """Test creating sessions in bulk"""
+        sessions = await store.create_many([
+            ("sess_001", "tenant_a", "user_001", "telegram"),
+            ("sess_002", "tenant_a", "user_002", None),
+        ])
+        
+        assert [s.id for s in sessions] == ["sess_001", "sess_002"]
+        assert await store.count(tenant_id="tenant_a") == 2
+        assert (await store.get("sess_001")).channel == "telegram"
+    
     @pytest.mark.asyncio
     async def test_get_session(self, store):
         """Test getting a session"""
@@ -74,6 +80,31 @@ class TestInMemorySessionStore:
         session = await store.get("sess_001")
         assert session is None
     
+    @pytest.mark.asyncio
+    async def test_non_str_values_are_not_interned(self, store):
+        """Test str subclasses (e.g. enum members) and None are stored as given"""
+        class Status(str):
+            pass
+        
+        await store.create("sess_001", None, "user_001")
+        closed = Status("closed")
+        
+        assert await store.update("sess_001", status=closed) is True
+        assert (await store.get("sess_001")).status is closed
+        assert [s.id for s in await store.list(status="closed")] == ["sess_001"]
+    
+    @pytest.mark.asyncio
+    async def test_tenant_scoped_lookups(self, store):
+        """Test get/update/delete with a tenant_id only see that tenant's sessions"""
+        await store.create("sess_001", "tenant_a", "user_001")
+        
+        assert await store.get("sess_001", tenant_id="tenant_b") is None
+        assert await store.update("sess_001", status="closed", tenant_id="tenant_b") is False
+        assert await store.delete("sess_001", tenant_id="tenant_b") is False
+        
+        assert (await store.get("sess_001", tenant_id="tenant_a")).status == "active"
+        assert await store.delete("sess_001", tenant_id="tenant_a") is True
+    
     @pytest.mark.asyncio
     async def test_list_sessions_by_tenant(self, store):
         """Test listing sessions by tenant"""
@@ -98,6 +129,18 @@ class TestInMemorySessionStore:
         assert len(active) == 1
         assert len(closed) == 1
     
+    @pytest.mark.asyncio
+    async def test_list_by_status_in_creation_order(self, store):
+        """Test status-filtered pages keep creation order, not status-change order"""
+        await store.create("sess_001", "tenant_a", "user_001")
+        await store.create("sess_002", "tenant_a", "user_001")
+        await store.create("sess_003", "tenant_a", "user_001")
+        await store.update("sess_002", status="closed")
+        await store.update("sess_001", status="closed")
+        
+        assert [s.id for s in await store.list(status="closed")] == ["sess_001", "sess_002"]
+        assert [s.id for s in await store.list(tenant_id="tenant_a", status="closed", limit=1, offset=1)] == ["sess_002"]
+    
     @pytest.mark.asyncio
     async def test_count_sessions(self, store):
         """Test counting sessions"""
@@ -110,6 +153,167 @@ class TestInMemorySessionStore:
         
         assert total == 3
         assert tenant_a == 2
+    
+    @pytest.mark.asyncio
+    async def test_list_sessions_combined_filters(self, store):
+        """Test listing with several filters, pagination and deletes"""
+        await store.create("sess_001", "tenant_a", "user_001")
+        await store.create("sess_002", "tenant_a", "user_001")
+        await store.create("sess_003", "tenant_a", "user_002")
+        await store.create("sess_004", "tenant_b", "user_001")
+        await store.update("sess_002", status="closed")
+        
+        active = await store.list(tenant_id="tenant_a", user_id="user_001", status="active")
+        page = await store.list(tenant_id="tenant_a", limit=2, offset=1)
+        
+        assert [s.id for s in active] == ["sess_001"]
+        assert [s.id for s in page] == ["sess_002", "sess_003"]
+        assert await store.count(user_id="user_001") == 3
+        
+        await store.delete("sess_001")
+        
+        assert await store.count(tenant_id="tenant_a", status="active") == 1
+        assert await store.list(tenant_id="tenant_a", user_id="user_001", status="active") == []
+
+
+class TestPostgreSQLSessionStore:
+    """SQL Session Store Tests (SQLite backend)"""
+    
+    @pytest.mark.asyncio
+    async def test_create_and_get_session(self, sql_store):
+        """Test creating and reading back a session"""
+        session = await sql_store.create("sess_001", "tenant_a", "user_001", channel="telegram")
+        
+        assert session.status == "active"
+        loaded = await sql_store.get("sess_001")
+        assert loaded.tenant_id == "tenant_a"
+        assert loaded.channel == "telegram"
+        assert loaded.status == "active"
+        assert loaded.metadata == {}
+        assert await sql_store.get("nonexistent") is None
+        assert await sql_store.get("sess_001", tenant_id="tenant_b") is None
+    
+    @pytest.mark.asyncio
+    async def test_update_session(self, sql_store):
+        """Test updating status and metadata"""
+        await sql_store.create("sess_001", "tenant_a", "user_001")
+        
+        assert await sql_store.update("sess_001", status="closed", metadata={"k": "v"}) is True
+        assert await sql_store.update("sess_001", status="active", tenant_id="tenant_b") is False
+        assert await sql_store.update("sess_001") is True
+        assert await sql_store.update("nonexistent", status="closed") is False
+        
+        session = await sql_store.get("sess_001", tenant_id="tenant_a")
+        assert session.status == "closed"
+        assert session.metadata == {"k": "v"}
+    
+    @pytest.mark.asyncio
+    async def test_delete_session(self, sql_store):
+        """Test deleting a session"""
+        await sql_store.create("sess_001", "tenant_a", "user_001")
+        
+        assert await sql_store.delete("sess_001", tenant_id="tenant_b") is False
+        assert await sql_store.delete("sess_001", tenant_id="tenant_a") is True
+        assert await sql_store.delete("sess_001") is False
+        assert await sql_store.get("sess_001") is None
+    
+    @pytest.mark.asyncio
+    async def test_create_many_list_and_count(self, sql_store):
+        """Test bulk create, filtered listing, paging and counts"""
+        await sql_store.create_many([
+            ("sess_001", "tenant_a", "user_001", "telegram"),
+            ("sess_002", "tenant_a", "user_002", None),
+            ("sess_003", "tenant_b", "user_001", None),
+        ])
+        await sql_store.update("sess_002", status="closed")
+        
+        assert await sql_store.create_many([]) == []
+        assert [s.id for s in await sql_store.list()] == ["sess_001", "sess_002", "sess_003"]
+        assert [s.id for s in await sql_store.list(tenant_id="tenant_a", limit=1, offset=1)] == ["sess_002"]
+        assert [s.id for s in await sql_store.list(user_id="user_001")] == ["sess_001", "sess_003"]
+        assert [s.id for s in await sql_store.list(status="closed")] == ["sess_002"]
+        assert await sql_store.count() == 3
+        assert await sql_store.count(tenant_id="tenant_a") == 2
+        assert await sql_store.count(tenant_id="tenant_a", status="active") == 1
+    
+    @pytest.mark.asyncio
+    async def test_list_streams_large_pages(self, sql_store):
+        """Test pages above STREAM_THRESHOLD are streamed in full"""
+        rows = STREAM_THRESHOLD + 10
+        await sql_store.create_many(
+            (f"sess_{i:04d}", "tenant_a", "user_001", None) for i in range(rows)
+        )
+        
+        sessions = await sql_store.list(tenant_id="tenant_a", limit=rows + 1)
+        
+        assert len(sessions) == rows
+        assert sessions[0].id == "sess_0000"
+        assert sessions[-1].id == f"sess_{rows - 1:04d}"
+        assert len(await sql_store.list(limit=STREAM_THRESHOLD + 1, offset=20)) == rows - 20
+    
+    @pytest.mark.asyncio
+    async def test_session_messages_load_explicitly(self, db, sql_store):
+        """Test session messages raise unless loaded with selectinload()"""
+        from sqlalchemy import select
+        from sqlalchemy.exc import InvalidRequestError
+        from sqlalchemy.orm import selectinload
+        from storage.models.models import MessageModel, SessionModel
+        
+        await sql_store.create("sess_001", "tenant_a", "user_001")
+        async with db.get_session("tenant_a") as session:
+            session.add(MessageModel(
+                id="msg_001", tenant_id="tenant_a", session_id="sess_001", role="user", content="hi"
+            ))
+        
+        async with db.get_session("tenant_a") as session:
+            loaded = await session.scalar(select(SessionModel))
+            with pytest.raises(InvalidRequestError):
+                loaded.messages
+        
+        async with db.get_session("tenant_a") as session:
+            loaded = await session.scalar(select(SessionModel).options(selectinload(SessionModel.messages)))
+            assert [m.content for m in loaded.messages] == ["hi"]
+    
+    @pytest.mark.asyncio
+    async def test_request_scope_commits_or_rolls_back(self, db, sql_store):
+        """Test request_scope shares one transaction across store calls"""
+        async with db.request_scope("tenant_a") as scoped:
+            await sql_store.create("sess_001", "tenant_a", "user_001")
+            async with db.get_session("tenant_a") as inner:
+                assert inner is scoped
+            assert (await sql_store.get("sess_001", tenant_id="tenant_a")).id == "sess_001"
+        
+        with pytest.raises(RuntimeError):
+            async with db.request_scope("tenant_a"):
+                await sql_store.create("sess_002", "tenant_a", "user_001")
+                await sql_store.update("sess_001", status="closed", tenant_id="tenant_a")
+                raise RuntimeError("request failed")
+        
+        assert (await sql_store.get("sess_001")).status == "active"
+        assert await sql_store.get("sess_002") is None
+        assert await sql_store.count() == 1
+    
+    @pytest.mark.asyncio
+    async def test_request_scope_rejects_other_tenants_and_tasks(self, db, sql_store):
+        """Test a scope's session is not handed to another tenant or a spawned task"""
+        async def create_in_task():
+            await sql_store.create("sess_002", "tenant_a", "user_001")
+        
+        async def create_in_own_scope():
+            async with db.request_scope("tenant_a"):
+                await sql_store.create("sess_003", "tenant_a", "user_001")
+        
+        async with db.request_scope("tenant_a"):
+            with pytest.raises(ValueError):
+                await sql_store.get("sess_001", tenant_id="tenant_b")
+            with pytest.raises(ValueError):
+                async with db.request_scope("tenant_b"):
+                    pass
+            with pytest.raises(RuntimeError):
+                await asyncio.create_task(create_in_task())
+            await asyncio.gather(create_in_own_scope())
+        
+        assert [s.id for s in await sql_store.list()] == ["sess_003"]
 
 
 class TestSessionData:
@@ -5,21 +5,13 @@ Tests for Phase 4: Skill registry and market.
 """
 
 import pytest
-import sys
-import os
 
-sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-
-from skills.market import SkillRegistry, SkillMarket, Skill
+from skills.market import Skill
 
 
 class TestSkillRegistry:
     """Skill Registry Tests"""
     
-    @pytest.fixture
-    def registry(self):
-        return SkillRegistry()
-    
     def test_register_skill(self, registry):
         """Test registering a skill"""
         skill = registry.register(
@@ -105,6 +97,29 @@ class TestSkillRegistry:
         
         assert len(skills) == 2
     
+    def test_list_skills_most_recently_updated_first(self, registry):
+        """Test tenant listing follows update order and honours limit"""
+        first = registry.register("tenant_a", "skill_1", "# Test 1")
+        second = registry.register("tenant_a", "skill_2", "# Test 2")
+        third = registry.register("tenant_a", "skill_3", "# Test 3")
+        
+        registry.update(first.id, version="1.0.1")
+        
+        assert [s.id for s in registry.list(tenant_id="tenant_a")] == [first.id, third.id, second.id]
+        assert [s.id for s in registry.list(tenant_id="tenant_a", limit=2)] == [first.id, third.id]
+    
+    def test_list_order_with_equal_timestamps(self, registry):
+        """Test every listing path breaks updated_at ties the same way"""
+        skills = [registry.register("tenant_a", f"skill_{i}", "# Test", tags=["api"]) for i in range(4)]
+        registry.update(skills[1].id, version="1.0.1")
+        for skill in skills:
+            skill.updated_at = skills[0].updated_at
+        
+        expected = [skills[1].id, skills[3].id, skills[2].id, skills[0].id]
+        assert [s.id for s in registry.list(tenant_id="tenant_a")] == expected
+        assert [s.id for s in registry.list(tenant_id="tenant_a", tags=["api"])] == expected
+        assert [s.id for s in registry.list(tenant_id="tenant_a", include_public=True)] == expected
+    
     def test_list_public_skills(self, registry):
         """Test listing public skills"""
         registry.register("tenant_a", "public_skill", "# Public", is_public=True)
@@ -114,6 +129,20 @@ class TestSkillRegistry:
         
         assert any(s.is_public for s in public)
     
+    def test_public_skills_follow_visibility_changes(self, registry):
+        """Test public listing follows is_public updates and deletes"""
+        skill = registry.register("tenant_a", "shared", "# Test", tags=["api"])
+        
+        assert registry.list(tenant_id="tenant_b", include_public=True) == []
+        
+        registry.update(skill.id, is_public=True)
+        
+        assert [s.id for s in registry.list(tenant_id="tenant_b", include_public=True, tags=["api"])] == [skill.id]
+        
+        registry.delete(skill.id)
+        
+        assert registry.list(include_public=True) == []
+    
     def test_search_skills(self, registry):
         """Test searching skills"""
         registry.register("tenant_a", "weather", "# Weather skill", description="Get weather")
@@ -124,6 +153,19 @@ class TestSkillRegistry:
         assert len(results) >= 1
         assert any("weather" in s.name.lower() for s in results)
     
+    def test_search_after_description_update(self, registry):
+        """Test search matches partial words and follows description changes"""
+        skill = registry.register("tenant_a", "forecast", "# Test", description="Daily weather report")
+        registry.register("tenant_b", "private", "# Test", description="Weather for tenant b")
+        
+        assert [s.id for s in registry.search(tenant_id="tenant_a", query="WEATH")] == [skill.id]
+        assert [s.id for s in registry.search(tenant_id="tenant_a", query="weather rep")] == [skill.id]
+        
+        registry.update(skill.id, description="Stock prices")
+        
+        assert registry.search(tenant_id="tenant_a", query="weather") == []
+        assert [s.id for s in registry.search(tenant_id="tenant_a", query="stock")] == [skill.id]
+    
     def test_check_permission(self, registry):
         """Test permission checking"""
         skill = registry.register(
@@ -175,6 +217,20 @@ class TestSkillRegistry:
         assert len(results) == 1
         assert "utility" in results[0].tags
     
+    def test_skill_tags_after_update(self, registry):
+        """Test tag filtering follows tag updates and deletes"""
+        skill = registry.register("tenant_a", "tagged_skill", "# Test", tags=["utility"])
+        registry.register("tenant_a", "other_skill", "# Test", tags=["api"])
+        
+        registry.update(skill.id, tags=["api"])
+        
+        assert registry.list(tenant_id="tenant_a", tags=["utility"]) == []
+        assert len(registry.list(tenant_id="tenant_a", tags=["api"])) == 2
+        
+        registry.delete(skill.id)
+        
+        assert len(registry.search(tenant_id="tenant_a", tags=["api"])) == 1
+    
     def test_count_skills(self, registry):
         """Test counting skills"""
         registry.register("tenant_a", "skill_1", "# Test")
@@ -191,14 +247,6 @@ class TestSkillRegistry:
 class TestSkillMarket:
     """Skill Market Tests"""
     
-    @pytest.fixture
-    def registry(self):
-        return SkillRegistry()
-    
-    @pytest.fixture
-    def market(self, registry):
-        return SkillMarket(registry)
-    
     def test_browse_skills(self, market, registry):
         """Test browsing skills"""
         registry.register("tenant_a", "skill_1", "# Test")
@@ -242,6 +290,17 @@ class TestSkillMarket:
         
         assert installed1.id == installed2.id
     
+    def test_install_keeps_tags_independent(self, market, registry):
+        """Test an installed copy's tags are unaffected by source tag updates"""
+        source = registry.register("tenant_a", "tagged", "# Test", is_public=True, tags=["api"])
+        installed = market.install(source.id, "tenant_b")
+        
+        registry.update(source.id, tags=["utility"])
+        
+        assert installed.tags == ("api",)
+        assert registry.list(tenant_id="tenant_b", tags=["api"]) == [installed]
+        assert market.browse(tenant_id="tenant_b", category="api")[0]["tags"] == ["api"]
+    
     def test_uninstall_skill(self, market, registry):
         """Test uninstalling skill"""
         skill = registry.register("tenant_a", "to_delete", "# Test")
@@ -259,6 +318,17 @@ class TestSkillMarket:
         results = market.browse(tenant_id="tenant_a", category="utility")
         
         assert len(results) == 1
+    
+    def test_browse_with_query_and_category(self, market, registry):
+        """Test query browsing honours category and active status"""
+        registry.register("tenant_a", "weather_api", "# Test", tags=["api"])
+        registry.register("tenant_a", "weather_cli", "# Test", tags=["utility"])
+        inactive = registry.register("tenant_a", "weather_old", "# Test", tags=["api"])
+        registry.update(inactive.id, is_active=False)
+        
+        results = market.browse(tenant_id="tenant_a", category="api", query="weather")
+        
+        assert [r["name"] for r in results] == ["weather_api"]
 
 
 class TestSkill:
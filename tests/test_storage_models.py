@@ -0,0 +1,97 @@
+"""
+Storage Model Tests
+
+Tests for the SQLAlchemy query builders in storage.models.
+"""
+
+import pytest
+
+pytest.importorskip("sqlalchemy")
+
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.exc import InvalidRequestError
+
+from enterprise.license import LicenseStatus, LicenseType
+from storage.models.models import (
+    PGVECTOR_AVAILABLE,
+    LicenseModel,
+    MemoryModel,
+    SkillModel,
+    list_memories,
+    list_skills,
+    nearest_memories,
+)
+
+
+class TestLicenseModel:
+    """License Model Tests"""
+    
+    def test_columns_use_domain_enums(self):
+        """Test license columns store the enterprise.license enum values"""
+        assert LicenseModel.license_type.type.enums == [t.value for t in LicenseType]
+        assert LicenseModel.status.type.enums == [s.value for s in LicenseStatus]
+    
+    @pytest.mark.asyncio
+    async def test_round_trip(self, db, now):
+        """Test domain enum members are written and read back"""
+        async with db.get_session() as session:
+            session.add(LicenseModel(
+                id="lic_001",
+                license_key="STA-001",
+                license_type=LicenseType.STANDARD,
+                expires_at=now
+            ))
+        
+        async with db.get_session() as session:
+            license = await session.get(LicenseModel, "lic_001")
+            
+            assert license.license_type is LicenseType.STANDARD
+            assert license.status is LicenseStatus.ACTIVE
+
+
+class TestNearestMemories:
+    """pgvector ANN Query Tests"""
+    
+    @pytest.mark.skipif(not PGVECTOR_AVAILABLE, reason="pgvector not installed")
+    def test_tenant_filtered_distance_order(self):
+        """Test the query filters by tenant, orders by cosine distance and skips the embedding"""
+        sql = str(nearest_memories("tenant_a", [0.0] * 1536, limit=5).compile(dialect=postgresql.dialect()))
+        select_list, _, rest = sql.partition("FROM memories")
+        
+        assert "memories.embedding" not in select_list
+        assert "memories.tenant_id = " in rest
+        assert "ORDER BY memories.embedding <=> " in rest
+        assert "LIMIT " in rest
+
+
+class TestListQueries:
+    """Column-limited List Query Tests (SQLite backend)"""
+    
+    @pytest.mark.asyncio
+    async def test_list_memories_skips_content(self, db):
+        """Test memory pages load summary columns and raise on content access"""
+        async with db.get_session("tenant_a") as session:
+            session.add(MemoryModel(id="mem_001", tenant_id="tenant_a", user_id="user_001", content="note"))
+            session.add(MemoryModel(id="mem_002", tenant_id="tenant_b", user_id="user_001", content="other"))
+        
+        async with db.get_session("tenant_a") as session:
+            memories = (await session.scalars(list_memories("tenant_a", user_id="user_001"))).all()
+            
+            assert [m.id for m in memories] == ["mem_001"]
+            assert memories[0].user_id == "user_001"
+            with pytest.raises(InvalidRequestError):
+                memories[0].content
+    
+    @pytest.mark.asyncio
+    async def test_list_skills_skips_manifest(self, db):
+        """Test skill pages filter by activity and raise on manifest access"""
+        async with db.get_session("tenant_a") as session:
+            session.add(SkillModel(id="skill_001", tenant_id="tenant_a", name="weather", manifest="# Weather"))
+            session.add(SkillModel(id="skill_002", tenant_id="tenant_a", name="old", manifest="# Old", is_active=False))
+        
+        async with db.get_session("tenant_a") as session:
+            skills = (await session.scalars(list_skills("tenant_a", is_active=True))).all()
+            
+            assert [s.name for s in skills] == ["weather"]
+            with pytest.raises(InvalidRequestError):
+                skills[0].manifest
@@ -6,9 +6,7 @@ Tests for Phase 3: Vector memory store.
 
 import pytest
 import sys
-import os
-
-sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from enum import Enum
 
 from memory.vector import VectorMemoryStore, MemoryItem
 
@@ -16,10 +14,16 @@ from memory.vector import VectorMemoryStore, MemoryItem
 class TestVectorMemoryStore:
     """Vector Memory Store Tests"""
     
-    @pytest.fixture
-    def store(self):
+    @pytest.fixture(scope="module")
+    def _vector_store(self):
         return VectorMemoryStore()
     
+    @pytest.fixture
+    def store(self, _vector_store):
+        """Module-wide store, emptied after each test"""
+        yield _vector_store
+        _vector_store.reset()
+    
     @pytest.mark.asyncio
     async def test_add_memory(self, store):
         """Test adding a memory"""
@@ -99,6 +103,30 @@ class TestVectorMemoryStore:
         assert len(results) == 2
         assert all("Python" in m.content for m in results)
     
+    @pytest.mark.asyncio
+    async def test_search_after_content_update(self, store):
+        """Test keyword search sees updated content, case-insensitively"""
+        memory = await store.add("tenant_a", "user_001", "Python programming tips")
+        await store.update(memory.id, content="Rust ownership notes")
+        
+        assert await store.search(tenant_id="tenant_a", query="python") == []
+        results = await store.search(tenant_id="tenant_a", query="RUST")
+        assert [m.id for m in results] == [memory.id]
+    
+    @pytest.mark.asyncio
+    async def test_search_after_delete_and_clear(self, store):
+        """Test keyword search drops deleted and cleared memories"""
+        deleted = await store.add("tenant_a", "user_001", "Python programming tips")
+        await store.add("tenant_a", "user_002", "Python best practices")
+        kept = await store.add("tenant_a", "user_003", "Python style guide")
+        
+        assert len(await store.search(tenant_id="tenant_a", query="python")) == 3
+        
+        await store.delete(deleted.id)
+        await store.clear_user_memories("tenant_a", "user_002")
+        
+        assert [m.id for m in await store.search(tenant_id="tenant_a", query="python")] == [kept.id]
+    
     @pytest.mark.asyncio
     async def test_search_by_user(self, store):
         """Test filtering by user"""
@@ -132,6 +160,21 @@ class TestVectorMemoryStore:
         assert len(results) == 1
         assert "work" in results[0].tags
     
+    @pytest.mark.asyncio
+    async def test_search_combined_filters(self, store):
+        """Test user, type and tag filters all apply whichever index is narrowest"""
+        match = await store.add("tenant_a", "user_001", "Work task", tags=["work"])
+        await store.add("tenant_a", "user_001", "Work log", memory_type="daily_log", tags=["work"])
+        await store.add("tenant_a", "user_001", "Personal note", tags=["personal"])
+        for i in range(3):
+            await store.add("tenant_a", "user_002", f"Other work {i}", tags=["work"])
+        
+        results = await store.search(tenant_id="tenant_a", user_id="user_001", memory_type="long_term", tags=["work"])
+        
+        assert [m.id for m in results] == [match.id]
+        assert await store.count(tenant_id="tenant_a", memory_type="daily_log") == 1
+        assert await store.count(tenant_id="tenant_a", user_id="user_001", memory_type="long_term") == 2
+    
     @pytest.mark.asyncio
     async def test_tenant_isolation(self, store):
         """Test tenant isolation"""
@@ -183,6 +226,18 @@ class TestVectorMemoryStore:
         assert await store.count(tenant_id="tenant_a", user_id="user_001") == 0
         assert await store.count(tenant_id="tenant_a", user_id="user_002") == 1
     
+    @pytest.mark.asyncio
+    async def test_reset(self, store):
+        """Test reset removes all memories"""
+        await store.add("tenant_a", "user_001", "Memory 1", tags=["work"])
+        await store.search(tenant_id="tenant_a", query="memory")
+        
+        store.reset()
+        
+        assert await store.count() == 0
+        assert await store.search(tenant_id="tenant_a", query="memory") == []
+        assert await store.search(tenant_id="tenant_a", tags=["work"]) == []
+    
     @pytest.mark.asyncio
     async def test_pin_memory(self, store):
         """Test pinning memory"""
@@ -196,12 +251,83 @@ class TestVectorMemoryStore:
     @pytest.mark.asyncio
     async def test_search_limit(self, store):
         """Test search limit"""
-        for i in range(20):
-            await store.add("tenant_a", "user_001", f"Memory {i}")
+        await store.add_many("tenant_a", "user_001", [f"Memory {i}" for i in range(20)])
         
         results = await store.search(tenant_id="tenant_a", limit=5)
         
         assert len(results) == 5
+    
+    @pytest.mark.asyncio
+    async def test_add_many_with_embeddings(self, store):
+        """Test bulk add pairs embeddings with contents in order"""
+        memories = await store.add_many(
+            "tenant_a", "user_001", ["North", "East"], tags=["compass"],
+            embeddings=[[0.0, 1.0], [1.0, 0.0]]
+        )
+        
+        assert [m.embedding for m in memories] == [[0.0, 1.0], [1.0, 0.0]]
+        assert memories[0].tags is not memories[1].tags
+        assert [m.id for m in await store.search_by_vector("tenant_a", [1.0, 0.1], limit=1)] == [memories[1].id]
+        
+        with pytest.raises(ValueError):
+            await store.add_many("tenant_a", "user_001", ["West"], embeddings=[])
+    
+    @pytest.mark.asyncio
+    async def test_search_by_vector(self, store):
+        """Test semantic search ranks by cosine similarity"""
+        await store.add("tenant_a", "user_001", "North", embedding=[0.0, 1.0])
+        await store.add("tenant_a", "user_001", "East", embedding=[1.0, 0.0])
+        await store.add("tenant_a", "user_002", "North-east", embedding=[1.0, 1.0])
+        await store.add("tenant_a", "user_001", "No embedding")
+        await store.add("tenant_b", "user_001", "Other tenant", embedding=[0.0, 1.0])
+        
+        results = await store.search_by_vector("tenant_a", [0.1, 1.0], limit=2)
+        assert [m.content for m in results] == ["North", "North-east"]
+        
+        results = await store.search_by_vector("tenant_a", [0.1, 1.0], user_id="user_001")
+        assert [m.content for m in results] == ["North", "East"]
+        
+        await store.add("tenant_a", "user_001", "North log", memory_type="daily_log", embedding=[0.0, 1.0])
+        results = await store.search_by_vector("tenant_a", [0.1, 1.0], user_id="user_001", memory_type="daily_log")
+        assert [m.content for m in results] == ["North log"]
+    
+    @pytest.mark.asyncio
+    async def test_search_by_vector_after_delete(self, store):
+        """Test semantic search reflects deleted memories"""
+        north = await store.add("tenant_a", "user_001", "North", embedding=[0.0, 1.0])
+        await store.add("tenant_a", "user_001", "East", embedding=[1.0, 0.0])
+        await store.search_by_vector("tenant_a", [0.0, 1.0])
+        
+        await store.delete(north.id)
+        
+        results = await store.search_by_vector("tenant_a", [0.0, 1.0])
+        assert [m.content for m in results] == ["East"]
+    
+    @pytest.mark.asyncio
+    async def test_search_by_vector_quantized(self):
+        """Test semantic search ranking with int8 embeddings"""
+        store = VectorMemoryStore(quantize_embeddings=True)
+        await store.add("tenant_a", "user_001", "North", embedding=[0.0, 1.0])
+        await store.add("tenant_a", "user_001", "East", embedding=[1.0, 0.0])
+        await store.add("tenant_a", "user_001", "North-east", embedding=[1.0, 1.0])
+        
+        results = await store.search_by_vector("tenant_a", [0.1, 1.0])
+        
+        assert [m.content for m in results] == ["North", "North-east", "East"]
+    
+    @pytest.mark.asyncio
+    async def test_str_subclass_tags(self, store):
+        """Test str subclass tags (e.g. str enums) are kept as given"""
+        class Tag(str, Enum):
+            WORK = "work"
+        
+        memory = await store.add("tenant_a", "user_001", "Meeting notes", tags=[Tag.WORK])
+        assert memory.tags == [Tag.WORK]
+        
+        await store.update(memory.id, tags=[Tag.WORK, "urgent"])
+        
+        assert memory.tags[0] is Tag.WORK
+        assert [m.id for m in await store.search("tenant_a", tags=["work"])] == [memory.id]
 
 
 class TestMemoryItem:
@@ -222,6 +348,22 @@ class TestMemoryItem:
         assert memory.id == "test_001"
         assert memory.tenant_id == "tenant_a"
         assert memory.content == "Test content"
+    
+    def test_tags_interned(self):
+        """Test tags are interned and copied from the caller's list"""
+        tags = ["".join(["wo", "rk"])]
+        memory = MemoryItem(
+            id="test_001",
+            tenant_id="tenant_a",
+            user_id="user_001",
+            content="Test content",
+            memory_type="long_term",
+            tags=tags
+        )
+        
+        assert memory.tags == ["work"]
+        assert memory.tags[0] is sys.intern("work")
+        assert memory.tags is not tags
 
 
 if __name__ == "__main__":